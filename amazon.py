@@ -1,58 +1,33 @@
-import aiohttp
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from fake_useragent import UserAgent
-import logging
-
-# Setup User-Agent rotation and Selenium
-ua = UserAgent()
-
-def setup_selenium():
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")  # Run in headless mode
-    chrome_service = Service(r'C:\Users\mahes\Downloads\chromedriver-win64\chromedriver.exe')  # Update the path to chromedriver
-    driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
-    return driver
-
-def scrape_with_selenium(url):
-    driver = setup_selenium()
-    driver.get(url)
-    html = driver.page_source
-    driver.quit()
-    return html
-
-async def track_prices(url):
-    try:
-        html = scrape_with_selenium(url)  # Use Selenium to get the full HTML
-
-        soup = BeautifulSoup(html, 'lxml')
-
-        # Extract the product name
-        product_name_tag = soup.find(id="productTitle")
-        product_name = product_name_tag.get_text(strip=True) if product_name_tag else "Unknown Product"
-
-        # Extract the price
-        price_tag = soup.find("span", class_="a-price-whole")
-        if price_tag:
-            # Clean the price string
-            price_text = price_tag.get_text(strip=True).replace(',', '').replace('₹', '').strip()
-            price_fraction_tag = soup.find("span", class_="a-price-fraction")
-            if price_fraction_tag:
-                price_text += "." + price_fraction_tag.get_text(strip=True).strip()
-
-            try:
-                # Convert the cleaned price string to float
-                price_float = float(price_text)
-                return price_float, product_name
-            except ValueError as e:
-                logging.error(f"Value conversion failed: {e}")
-                return None, product_name
-        else:
-            logging.warning("No price elements found")
-            return None, product_name
-
-    except Exception as e:
-        logging.error(f"Error scraping product: {e}")
-        return None, None
+import os
+from plugins import ScraperPlugin, register
+from extractors import has_class
+
+amazon = register(ScraperPlugin(
+    "amazon",
+    hosts=("www.amazon.com", "amazon.com", "www.amazon.in", "amazon.in"),
+    short_hosts=("amzn.in", "amzn.to"),
+    # Ordered fallbacks per field: the first selector that yields text wins
+    selectors={
+        "title": [
+            '//*[@id="productTitle"]',
+            '//*[@id="title"]',
+            '//meta[@name="title"]/@content',
+        ],
+        "price": [
+            f'(//*[@id="corePrice_feature_div" or @id="corePriceDisplay_desktop_feature_div"]//span[{has_class("a-price-whole")}])[1]',
+            f'(//span[{has_class("a-price-whole")}])[1]',
+            '//*[@id="priceblock_dealprice"]',
+            '//*[@id="priceblock_ourprice"]',
+            f'(//span[{has_class("a-price")}]/span[{has_class("a-offscreen")}])[1]',
+        ],
+        "fraction": [
+            f'(//span[{has_class("a-price-fraction")}])[1]',
+        ],
+    },
+    # Markers around the price and title, used to detect unchanged pages
+    region_markers=("a-price-whole", "productTitle"),
+    # The price is usually in the server-rendered HTML; the browser is only the fallback
+    fetch="http",
+    concurrency=int(os.getenv("AMAZON_CONCURRENCY", "4")),
+    rate=float(os.getenv("AMAZON_RATE", "2")),
+))
@@ -0,0 +1,18 @@
+import asyncio
+import logging
+
+# The event loop only keeps weak references to tasks, so fire-and-forget tasks are held here
+_tasks = set()
+
+
+def _finished(task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"Background task {task.get_name()} failed", exc_info=task.exception())
+
+
+def spawn(coro, name=None):
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_finished)
+    return task
@@ -0,0 +1,125 @@
+# Compare the legacy per-item Mongo access in helpers.py with the batched,
+# indexed access layer in db.py.
+#
+#   mongod --dbpath /tmp/bench-db &
+#   python benchmarks/bench_db.py --products 100000 --heavy-trackings 1000
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ["DATABASE"] = os.getenv("BENCH_DATABASE", "PriceTrackerBench")
+os.environ["COLLECTION"] = "BenchTrackings"
+os.environ["PRODUCTS"] = "BenchProducts"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from db import collection, PRODUCTS  # noqa: E402
+
+HEAVY_USER = 1
+
+
+async def seed(products, heavy_trackings, other_users):
+    await collection.drop()
+    await PRODUCTS.drop()
+
+    batch = []
+    for i in range(products):
+        batch.append({
+            "product_name": f"Bench product {i}",
+            "url": f"https://www.amazon.in/dp/B{i:09d}",
+            "price": float(random.randint(100, 100000)),
+            "previous_price": 0.0,
+            "upper": 0.0,
+            "lower": 0.0,
+        })
+        if len(batch) == 5000:
+            await PRODUCTS.insert_many(batch)
+            batch = []
+    if batch:
+        await PRODUCTS.insert_many(batch)
+
+    ids = await PRODUCTS.distinct("_id")
+    trackings = [{"user_id": HEAVY_USER, "product_id": pid} for pid in random.sample(ids, heavy_trackings)]
+    for user_id in range(2, other_users + 2):
+        trackings.extend({"user_id": user_id, "product_id": pid} for pid in random.sample(ids, 5))
+    await collection.insert_many(trackings)
+    return ids
+
+
+async def legacy_fetch_all_products(user_id):
+    products = await collection.find({"user_id": user_id}).to_list(length=None)
+    global_products = []
+    for product in products:
+        global_product = await PRODUCTS.find_one({"_id": product.get("product_id")})
+        if global_product:
+            global_product["product_id"] = product.get("_id")
+            global_products.append(global_product)
+    return global_products
+
+
+async def legacy_find_product(name):
+    return await PRODUCTS.find_one({"product_name": name})
+
+
+async def legacy_delete(_id, user_id):
+    product = await collection.find_one({"_id": _id})
+    if product and product.get("user_id") == user_id:
+        await collection.delete_one({"_id": _id})
+        return True
+    return None
+
+
+async def timed(label, func, runs):
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        await func(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<38} median {statistics.median(samples):9.2f} ms   p95 {p95:9.2f} ms")
+
+
+async def scratch_trackings(ids, count):
+    result = await collection.insert_many([{"user_id": HEAVY_USER, "product_id": pid} for pid in random.sample(ids, count)])
+    return result.inserted_ids
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--heavy-trackings", type=int, default=1000)
+    parser.add_argument("--other-users", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Seeding {args.products} products...")
+    ids = await seed(args.products, args.heavy_trackings, args.other_users)
+    names = [f"Bench product {random.randrange(args.products)}" for _ in range(args.runs)]
+
+    print("\nBefore (legacy helpers, no indexes)")
+    await timed("/my_trackings (N+1 find_one)", lambda i: legacy_fetch_all_products(HEAVY_USER), args.runs)
+    await timed("product lookup by name", lambda i: legacy_find_product(names[i]), args.runs)
+    doomed = await scratch_trackings(ids, args.runs)
+    await timed("delete (read + delete)", lambda i: legacy_delete(doomed[i], HEAVY_USER), args.runs)
+
+    await db.ensure_indexes()
+
+    print("\nAfter (db.py, indexed)")
+    await timed("/my_trackings ($lookup)", lambda i: db.fetch_user_products(HEAVY_USER), args.runs)
+    await timed("product upsert by name", lambda i: db.upsert_product({"product_name": names[i]}, {"product_name": names[i]}), args.runs)
+    doomed = await scratch_trackings(ids, args.runs)
+    await timed("delete (atomic)", lambda i: db.delete_tracking(doomed[i], HEAVY_USER), args.runs)
+
+    await collection.drop()
+    await PRODUCTS.drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
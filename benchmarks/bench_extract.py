@@ -0,0 +1,103 @@
+# Compare the old BeautifulSoup parsers with extractors.extract over the saved
+# page fixtures, serially and through the extractor process pool.
+#
+#   python benchmarks/bench_extract.py --pages 200 --pad-kb 2048
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from extractors import extract, EXTRACT_WORKERS  # noqa: E402
+from plugins import PLUGINS  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_amazon(html):
+    soup = BeautifulSoup(html, 'lxml')
+    product_name_tag = soup.find(id="productTitle")
+    product_name = product_name_tag.get_text(strip=True) if product_name_tag else "Unknown Product"
+    price_tag = soup.find("span", class_="a-price-whole")
+    if not price_tag:
+        return None, product_name
+    price_text = price_tag.get_text(strip=True).replace(',', '').replace('₹', '').strip().rstrip('.')
+    price_fraction_tag = soup.find("span", class_="a-price-fraction")
+    if price_fraction_tag:
+        price_text += "." + price_fraction_tag.get_text(strip=True).strip()
+    return float(price_text), product_name
+
+
+def legacy_flipkart(html):
+    soup = BeautifulSoup(html, 'lxml')
+    product_name_tag = soup.find("span", class_="B_NuCI")
+    product_name = product_name_tag.get_text(strip=True) if product_name_tag else "Unknown Product"
+    price_tag = soup.find("div", class_="_30jeq3 _16Jk6d")
+    if not price_tag:
+        return None, product_name
+    return float(price_tag.get_text(strip=True).replace(',', '').replace('₹', '').strip()), product_name
+
+
+LEGACY = {"amazon": legacy_amazon, "flipkart": legacy_flipkart}
+SELECTORS = {platform: PLUGINS[platform].selectors for platform in LEGACY}
+
+
+def load_pages(pad_kb):
+    # Real product pages are mostly scripts and unrelated markup; padding simulates their size
+    filler = '<div class="filler"><span>recommended item</span><script>var x = 1;</script></div>\n'
+    padding = filler * (pad_kb * 1024 // len(filler))
+    pages = {}
+    for platform in ("amazon", "flipkart"):
+        with open(os.path.join(FIXTURES, f"{platform}_product.html"), encoding="utf-8") as f:
+            html = f.read()
+        pages[platform] = html.replace("</body>", padding + "</body>")
+    return pages
+
+
+def run_serial(label, parser, pages, count):
+    start = time.perf_counter()
+    for i in range(count):
+        platform = "amazon" if i % 2 == 0 else "flipkart"
+        parser(platform, pages[platform])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {count / elapsed:9.1f} pages/s   {elapsed / count * 1000:8.2f} ms/page")
+
+
+async def run_pool(pages, count, workers):
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Warm up the workers so process start-up isn't measured
+        await asyncio.gather(*(loop.run_in_executor(pool, extract, "amazon", pages["amazon"], SELECTORS["amazon"]) for _ in range(workers)))
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            loop.run_in_executor(pool, extract, platform, pages[platform], SELECTORS[platform])
+            for platform in ("amazon" if i % 2 == 0 else "flipkart" for i in range(count))
+        ))
+        elapsed = time.perf_counter() - start
+    print(f"{f'lxml XPath, {workers} processes':<32} {count / elapsed:9.1f} pages/s   {elapsed / count * 1000:8.2f} ms/page")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--pad-kb", type=int, default=2048, help="Filler markup added to each fixture")
+    parser.add_argument("--workers", type=int, default=max(1, EXTRACT_WORKERS))
+    args = parser.parse_args()
+
+    pages = load_pages(args.pad_kb)
+    for platform, html in pages.items():
+        assert extract(platform, html, SELECTORS[platform])[:2] == LEGACY[platform](html), f"{platform} extractors disagree"
+        print(f"{platform} page: {len(html) / 1024:.0f} KB -> {extract(platform, html, SELECTORS[platform])[:2]}")
+
+    run_serial("BeautifulSoup (legacy)", lambda platform, html: LEGACY[platform](html), pages, args.pages)
+    run_serial("lxml XPath, serial", lambda platform, html: extract(platform, html, SELECTORS[platform]), pages, args.pages)
+    asyncio.run(run_pool(pages, args.pages, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Import time of the main entry modules, each in a fresh interpreter, and the
+# cold-start time to the first price update: a new process imports the check
+# pass, connects and updates one due product served by the local fixture store.
+#
+#   python benchmarks/bench_startup.py --runs 5
+#   python benchmarks/bench_startup.py --cold-start      # needs a local mongod
+#   python benchmarks/bench_startup.py --detail worker   # slowest imports of one module
+
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ["DATABASE"] = os.getenv("BENCH_DATABASE", "PriceTrackerBench")
+os.environ["COLLECTION"] = "BenchTrackings"
+os.environ["PRODUCTS"] = "BenchProducts"
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+MODULES = ["scraper", "scheduler", "worker", "main"]
+
+
+def time_import(module, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPO_DIR, check=True, capture_output=True)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def import_detail(module, top=15):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_DIR, check=True, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:9.1f} ms  {name}")
+
+
+async def child():
+    # Runs in the fresh process: everything from here on counts towards the cold start
+    from db import connect
+    import scheduler
+
+    connect()
+    await scheduler.run_check_pass(None)
+
+
+async def cold_start(runs):
+    from fake_services import FixtureServer
+    from db import PRODUCTS
+
+    server = await FixtureServer().start()
+    samples = []
+    for _ in range(runs):
+        await PRODUCTS.drop()
+        price = float(server.price_for("B000000001"))
+        result = await PRODUCTS.insert_one({
+            "product_name": "Cold start product",
+            "url": server.product_url("amazon", "B000000001"),
+            "platform": "amazon",
+            "product_key": "amazon:B000000001",
+            "price": price + 1,
+            "previous_price": price + 1,
+            "upper": price + 1,
+            "lower": price + 1,
+        })
+
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--child",
+            cwd=REPO_DIR, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        while True:
+            product = await PRODUCTS.find_one({"_id": result.inserted_id}, {"last_checked_at": 1})
+            if product.get("last_checked_at"):
+                samples.append(time.perf_counter() - started)
+                break
+            if process.returncode is not None:
+                raise RuntimeError("Cold start process exited before updating the product")
+            await asyncio.sleep(0.005)
+        await process.wait()
+
+    await PRODUCTS.drop()
+    await server.stop()
+    return samples
+
+
+def summarize(label, samples):
+    print(
+        f"{label:<28} median {statistics.median(samples) * 1000:8.1f} ms   "
+        f"min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cold-start", action="store_true", help="Also measure time to the first price update")
+    parser.add_argument("--detail", metavar="MODULE", help="Show the slowest imports of MODULE")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child())
+        return
+    if args.detail:
+        import_detail(args.detail)
+        return
+
+    print(f"{datetime.date.today()}  python {sys.version.split()[0]}")
+    for module in MODULES:
+        summarize(f"import {module}", time_import(module, args.runs))
+    if args.cold_start:
+        summarize("cold start to first update", asyncio.run(cold_start(args.runs)))
+
+
+if __name__ == "__main__":
+    main()
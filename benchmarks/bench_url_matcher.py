@@ -0,0 +1,81 @@
+# Micro-benchmark for incoming message filtering and link classification.
+# Compares the old per-pattern re.match loops with regex_patterns.classify_url.
+#
+#   python benchmarks/bench_url_matcher.py --messages 200000
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex_patterns import url_filter_pattern, url_extract_pattern, classify_url  # noqa: E402
+
+# The patterns main.py used before the compiled classifier
+legacy_flipkart_patterns = [
+    r'https?://www\.flipkart\.com/.+', r'https?://flipkart\.com/.+', r'https?://m\.flipkart\.com/.+',
+    r'https?://dl\.flipkart\.com/.+', r'https?://flipkart\.in/.+', r'https?://www\.flipkart\.in/.+',
+    r'https?://dl\.flipkart\.in/.+', r'https?://m\.flipkart\.in/.+', r'https?://fkrt\.cc/.+',
+    r'https?://fkrt\.co/.+', r'https?://fkrt\.it/.+',
+]
+legacy_amazon_patterns = [
+    r'https://www\.amazon\.com/.*', r'https://amazon\.com/.*', r'https://www\.amazon\.in/.*',
+    r'https://amazon\.in/.*', r'https://amzn\.in/.*', r'https://amzn\.to/.*', r'https://amzn\.in/.+',
+]
+legacy_all_patterns = legacy_amazon_patterns + legacy_flipkart_patterns
+
+SAMPLE_MESSAGES = [
+    "https://www.amazon.in/Apple-iPhone-15-128-GB/dp/B0CHX1W1XY/ref=sr_1_1?keywords=iphone",
+    "check this https://amzn.to/3xYzAbC",
+    "https://www.flipkart.com/apple-iphone-15/p/itm6ac6485515ae4?pid=MOBGTAGPTB3VS24W&lid=LSTMOB",
+    "https://fkrt.it/abcdEFgh",
+    "hello, how do I track a product?",
+    "https://www.example.com/some/other/link",
+    "/my_trackings",
+]
+
+
+def legacy_handle(text):
+    if not re.search("|".join(legacy_all_patterns), text):
+        return None
+    results = []
+    for url in re.findall(r'https?://\S+', text):
+        if any(re.match(pattern, url) for pattern in legacy_flipkart_patterns + legacy_amazon_patterns):
+            expand = True
+        else:
+            expand = False
+        platform = "amazon" if any(re.match(pattern, url) for pattern in legacy_amazon_patterns) else "flipkart"
+        results.append((platform, expand))
+    return results
+
+
+def compiled_handle(text):
+    if not url_filter_pattern.search(text):
+        return None
+    return [classify_url(url) for url in url_extract_pattern.findall(text)]
+
+
+def run(label, handler, messages):
+    start = time.perf_counter()
+    for text in messages:
+        handler(text)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {len(messages) / elapsed:12,.0f} msgs/s   {elapsed / len(messages) * 1e6:7.2f} us/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    messages = [random.choice(SAMPLE_MESSAGES) for _ in range(args.messages)]
+    run("legacy re.match loops", legacy_handle, messages)
+    run("compiled classifier", compiled_handle, messages)
+
+
+if __name__ == "__main__":
+    main()
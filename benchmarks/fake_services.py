@@ -0,0 +1,141 @@
+# Local stand-ins for the stores, EarnKaro and Telegram used by the benchmarks.
+
+import asyncio
+import os
+import random
+import zlib
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# The price shown in each fixture, replaced per product when served
+FIXTURE_PRICES = {"amazon": "69,900", "flipkart": "65,999"}
+
+
+def load_fixture(platform):
+    with open(os.path.join(FIXTURES, f"{platform}_product.html"), encoding="utf-8") as f:
+        return f.read()
+
+
+class FixtureServer:
+    # Serves the saved product pages with a configurable latency, plus short-link
+    # redirects and a stub of the EarnKaro converter API.
+
+    def __init__(self, latency=0.0, jitter=0.0, change_ratio=0.1, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.change_ratio = change_ratio
+        self.host = host
+        self.port = port
+        self.epoch = 0  # Bump between passes to make change_ratio of the products change price
+        self.requests = 0
+        self.pages = {platform: load_fixture(platform) for platform in FIXTURE_PRICES}
+        self._runner = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def product_url(self, platform, product_id):
+        if platform == "amazon":
+            return f"{self.base_url}/amazon/dp/{product_id}"
+        return f"{self.base_url}/flipkart/p/itm{product_id.lower()}?pid={product_id}"
+
+    def price_for(self, product_id):
+        seed = zlib.crc32(product_id.encode())
+        price = 1000 + seed % 90000
+        if (seed % 1000) / 1000 < self.change_ratio:
+            price += self.epoch * 10
+        return price
+
+    async def _delay(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _render(self, platform, product_id):
+        return self.pages[platform].replace(FIXTURE_PRICES[platform], f"{self.price_for(product_id):,}")
+
+    async def amazon_page(self, request):
+        self.requests += 1
+        await self._delay()
+        return web.Response(text=self._render("amazon", request.match_info["asin"]), content_type="text/html")
+
+    async def flipkart_page(self, request):
+        self.requests += 1
+        await self._delay()
+        return web.Response(text=self._render("flipkart", request.query.get("pid", "UNKNOWN")), content_type="text/html")
+
+    async def short_link(self, request):
+        await self._delay()
+        raise web.HTTPFound(f"/amazon/dp/{request.match_info['code'].upper():0>10}")
+
+    async def earnkaro(self, request):
+        await self._delay()
+        payload = await request.json()
+        return web.json_response({"success": 1, "data": payload["deal"]})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/amazon/dp/{asin}", self.amazon_page)
+        app.router.add_get("/flipkart/p/{itm}", self.flipkart_page)
+        app.router.add_route("*", "/s/{code}", self.short_link)
+        app.router.add_post("/api/converter/public", self.earnkaro)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class FakeMessage:
+    def __init__(self, client, chat_id, text="", message_id=1):
+        self._client = client
+        self.chat = type("Chat", (), {"id": chat_id})()
+        self.from_user = type("User", (), {"id": chat_id, "username": f"user{chat_id}"})()
+        self.id = message_id
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        return await self._client.send_message(self.chat.id, text, **kwargs)
+
+    async def edit(self, text, **kwargs):
+        return await self._client.edit_message_text(self.chat.id, self.id, text, **kwargs)
+
+    async def delete(self):
+        self._client.deleted += 1
+
+
+class FakeClient:
+    # Records what the bot would have sent to Telegram, with a simulated API latency
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = []
+        self.edits = 0
+        self.deleted = 0
+        self.send_latencies = []
+        self._next_id = 1
+
+    async def _call(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await self._call()
+        self.sent.append((chat_id, text))
+        self.send_latencies.append(loop.time() - started)
+        self._next_id += 1
+        return FakeMessage(self, chat_id, text, self._next_id)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await self._call()
+        self.edits += 1
+        return FakeMessage(self, chat_id, text, message_id)
@@ -0,0 +1,309 @@
+# Offline benchmark suite: runs the real price check pass, /my_trackings and
+# broadcast code against local fixtures, a fake Telegram client and a local
+# mongod, and reports throughput, p50/p99 latency and peak memory.
+#
+#   mongod --dbpath /tmp/bench-db &
+#   python benchmarks/run_benchmarks.py                      # full suite
+#   python benchmarks/run_benchmarks.py --quick              # smaller sizes
+#   python benchmarks/run_benchmarks.py --scenario check_prices --size 10000
+#   python benchmarks/run_benchmarks.py --output results.jsonl   # append for comparison across commits
+#   python benchmarks/run_benchmarks.py --scenario check_prices --size 100000 --write-batch 1   # one write per product
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Must be set before the bot modules read their configuration
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ["DATABASE"] = os.getenv("BENCH_DATABASE", "PriceTrackerBench")
+os.environ["COLLECTION"] = "BenchTrackings"
+os.environ["PRODUCTS"] = "BenchProducts"
+for name, value in {
+    "AMAZON_RATE": "100000",
+    "FLIPKART_RATE": "100000",
+    "AMAZON_CONCURRENCY": "64",
+    "FLIPKART_CONCURRENCY": "64",
+    "HTTP_LIMIT_PER_HOST": "64",
+    "BROADCAST_RATE": "100000",
+    "BROADCAST_CONCURRENCY": "100",
+    "NOTIFY_LINGER": "0.05",
+}.items():
+    os.environ.setdefault(name, value)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+FULL_SUITE = [("check_prices", 1000), ("check_prices", 10000), ("check_prices", 100000), ("my_trackings", 1000), ("broadcast", 50000)]
+QUICK_SUITE = [("check_prices", 1000), ("my_trackings", 200), ("broadcast", 5000)]
+
+# MongoDB commands sent during the measured part of a scenario
+db_commands = Counter()
+
+
+def count_db_commands():
+    from pymongo import monitoring
+
+    class CommandCounter(monitoring.CommandListener):
+        def started(self, event):
+            db_commands[event.command_name] += 1
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    # Must be registered before the client is created
+    monitoring.register(CommandCounter())
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+async def insert_in_batches(target, docs, batch_size=5000):
+    for i in range(0, len(docs), batch_size):
+        await target.insert_many(docs[i:i + batch_size])
+
+
+async def seed_products(server, size, watchers_per_product=2, users=1000):
+    from db import collection, PRODUCTS
+
+    await collection.drop()
+    await PRODUCTS.drop()
+    products = []
+    for i in range(size):
+        platform = "amazon" if i % 2 == 0 else "flipkart"
+        product_id = f"B{i:09d}" if platform == "amazon" else f"MOB{i:013d}"
+        price = float(server.price_for(product_id))
+        products.append({
+            "product_name": f"Bench product {i}",
+            "url": server.product_url(platform, product_id),
+            "platform": platform,
+            "product_key": f"{platform}:{product_id}",
+            "price": price,
+            "previous_price": price,
+            "upper": price,
+            "lower": price,
+            "watchers": watchers_per_product,
+        })
+    await insert_in_batches(PRODUCTS, products)
+
+    ids = await PRODUCTS.distinct("_id")
+    trackings = []
+    for product_id in ids:
+        for user_id in random.sample(range(1, users + 1), watchers_per_product):
+            trackings.append({"user_id": user_id, "product_id": product_id})
+    await insert_in_batches(collection, trackings)
+    return ids
+
+
+async def scenario_check_prices(size, args):
+    from fake_services import FixtureServer, FakeClient
+    from db import ensure_indexes
+    import notifier
+    import scheduler
+
+    server = await FixtureServer(latency=args.latency, jitter=args.latency / 2, change_ratio=args.change_ratio).start()
+    await seed_products(server, size)
+    await ensure_indexes()
+
+    latencies = []
+    check_product = scheduler.check_product
+
+    async def timed_check_product(*a, **kw):
+        started = time.perf_counter()
+        try:
+            return await check_product(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    scheduler.check_product = timed_check_product
+    client = FakeClient(latency=args.telegram_latency)
+    notifier_task = asyncio.create_task(notifier.run_notifier(client))
+
+    server.epoch = 1
+    db_commands.clear()
+    started = time.perf_counter()
+    await scheduler.run_check_pass(client)
+    while not notifier.change_queue.empty():
+        await asyncio.sleep(0.05)
+    # Let the notifier flush its last batch
+    await asyncio.sleep(notifier.NOTIFY_LINGER * 2)
+    duration = time.perf_counter() - started
+
+    notifier_task.cancel()
+    await server.stop()
+    return {
+        "duration_s": duration,
+        "throughput": size / duration,
+        "latencies": latencies,
+        "requests": server.requests,
+        "updated": scheduler.pass_stats["updated"],
+        "failed": scheduler.pass_stats["failed"],
+        "notifications": len(client.sent),
+        "write_round_trips": db_commands["update"] + db_commands["insert"],
+        "db_round_trips": sum(db_commands.values()),
+    }
+
+
+async def scenario_my_trackings(size, args):
+    from fake_services import FixtureServer, FakeClient, FakeMessage
+    from db import collection, ensure_indexes
+    import main
+
+    server = FixtureServer()
+    ids = await seed_products(server, size, watchers_per_product=1, users=50)
+    await collection.insert_many([{"user_id": 1, "product_id": product_id} for product_id in ids])
+    await ensure_indexes()
+
+    client = FakeClient(latency=args.telegram_latency)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(args.runs):
+        message = FakeMessage(client, chat_id=1, text="/my_trackings")
+        t0 = time.perf_counter()
+        await main.track(client, message)
+        latencies.append(time.perf_counter() - t0)
+    duration = time.perf_counter() - started
+    return {"duration_s": duration, "throughput": args.runs / duration, "latencies": latencies}
+
+
+async def scenario_broadcast(size, args):
+    from fake_services import FakeClient
+    from db import users_collection, broadcasts
+    from broadcast import BroadcastRun
+
+    await users_collection.drop()
+    await broadcasts.drop()
+    await insert_in_batches(users_collection, [{"user_id": i, "username": f"user{i}"} for i in range(1, size + 1)])
+
+    client = FakeClient(latency=args.telegram_latency)
+    status = await client.send_message(0, "Starting broadcast...")
+    job = {"text": "Benchmark broadcast", "status": "running", "status_chat_id": 0,
+           "status_message_id": status.id, "total": size, "last_user_id": None}
+    job["_id"] = (await broadcasts.insert_one(dict(job))).inserted_id
+
+    started = time.perf_counter()
+    await BroadcastRun(client, job).run()
+    duration = time.perf_counter() - started
+    return {"duration_s": duration, "throughput": size / duration, "latencies": client.send_latencies, "sent": len(client.sent) - 1}
+
+
+SCENARIOS = {
+    "check_prices": scenario_check_prices,
+    "my_trackings": scenario_my_trackings,
+    "broadcast": scenario_broadcast,
+}
+
+
+async def run_scenario(name, size, args):
+    from http_client import close_session
+
+    random.seed(0)
+    count_db_commands()
+    try:
+        result = await SCENARIOS[name](size, args)
+    finally:
+        await close_session()
+
+    latencies = result.pop("latencies")
+    return {
+        "scenario": name,
+        "size": size,
+        "commit": current_commit(),
+        "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else None,
+        "peak_rss_mb": peak_rss_mb(),
+        **result,
+    }
+
+
+def print_result(result):
+    def ms(value):
+        return f"{value:8.2f}" if value is not None else "     n/a"
+
+    writes = f"  writes {result['write_round_trips']}/{result['db_round_trips']} round-trips" if "write_round_trips" in result else ""
+    print(
+        f"{result['scenario']:<14} {result['size']:>7}  {result['throughput']:10.1f}/s  "
+        f"p50 {ms(result['p50_ms'])} ms  p99 {ms(result['p99_ms'])} ms  "
+        f"peak {result['peak_rss_mb']:7.1f} MB  ({result['duration_s']:.1f}s){writes}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--size", type=int)
+    parser.add_argument("--quick", action="store_true", help="Run the smaller suite")
+    parser.add_argument("--runs", type=int, default=50, help="Repetitions for /my_trackings")
+    parser.add_argument("--latency", type=float, default=0.05, help="Store page latency in seconds")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Simulated Telegram API latency")
+    parser.add_argument("--change-ratio", type=float, default=0.1, help="Share of products whose price changes")
+    parser.add_argument("--write-batch", type=int, help="Updates per bulk write in the check pass (WRITE_BATCH_SIZE)")
+    parser.add_argument("--output", help="Append JSON results to this file")
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.write_batch:
+        os.environ["WRITE_BATCH_SIZE"] = str(args.write_batch)
+
+    if args.scenario:
+        result = asyncio.run(run_scenario(args.scenario, args.size or dict(FULL_SUITE)[args.scenario], args))
+        if args.json:
+            print(json.dumps(result, default=str))
+        else:
+            print_result(result)
+        results = [result]
+    else:
+        # Every scenario runs in its own process so peak memory is per scenario
+        results = []
+        passthrough = [
+            "--runs", str(args.runs), "--latency", str(args.latency),
+            "--telegram-latency", str(args.telegram_latency), "--change-ratio", str(args.change_ratio),
+        ]
+        if args.write_batch:
+            passthrough += ["--write-batch", str(args.write_batch)]
+        for name, size in (QUICK_SUITE if args.quick else FULL_SUITE):
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), "--scenario", name, "--size", str(size), "--json", *passthrough],
+                text=True,
+            )
+            result = json.loads(output.strip().splitlines()[-1])
+            print_result(result)
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, default=str) + "\n")
+
+
+if __name__ == "__main__":
+    main()
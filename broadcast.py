@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+import os
+import logging
+from pyrogram.errors import FloodWait, UserIsBlocked, InputUserDeactivated, UserDeactivated, PeerIdInvalid
+from db import users_collection, broadcasts
+from rate_limit import TokenBucket
+import metrics
+from metrics import timed
+from background import spawn
+
+# Telegram allows roughly 30 messages per second across all chats
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "25"))
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "500"))
+BROADCAST_STATUS_INTERVAL = float(os.getenv("BROADCAST_STATUS_INTERVAL", "5"))
+
+# Errors that mean the user can never receive messages from the bot again
+GONE_ERRORS = (UserIsBlocked, InputUserDeactivated, UserDeactivated, PeerIdInvalid)
+
+
+class BroadcastRun:
+    def __init__(self, bot, job):
+        self.bot = bot
+        self.job = job
+        self.counts = {
+            "success": job.get("success", 0),
+            "failed": job.get("failed", 0),
+            "removed": job.get("removed", 0),
+        }
+        self.bucket = TokenBucket(BROADCAST_RATE)
+        self.semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+        self.pause_until = 0.0
+
+    @timed("telegram.send")
+    async def deliver(self, user_id):
+        await self.bot.send_message(user_id, self.job["text"])
+
+    async def send(self, user_id, gone):
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            while True:
+                # A flood wait pauses every sender, not just the one that hit it
+                delay = self.pause_until - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self.bucket.acquire()
+                try:
+                    await self.deliver(user_id)
+                    self.counts["success"] += 1
+                    metrics.count_send("broadcast", "success")
+                    return
+                except FloodWait as e:
+                    metrics.count_send("broadcast", "flood_wait")
+                    logging.warning(f"Broadcast flood wait of {e.value}s")
+                    self.pause_until = max(self.pause_until, loop.time() + e.value)
+                    self.bucket.rate = max(1.0, self.bucket.rate / 2)
+                except GONE_ERRORS:
+                    gone.append(user_id)
+                    self.counts["removed"] += 1
+                    metrics.count_send("broadcast", "gone")
+                    return
+                except Exception as e:
+                    logging.error(f"Failed to send message to {user_id}: {e}")
+                    self.counts["failed"] += 1
+                    metrics.count_send("broadcast", "failure")
+                    return
+
+    def status_text(self, done=False):
+        sent = self.counts["success"] + self.counts["failed"] + self.counts["removed"]
+        header = "Broadcast completed:" if done else "Broadcasting..."
+        return (
+            f"{header}\n"
+            f"Progress: {sent}/{self.job['total']}\n"
+            f"Success: {self.counts['success']}\n"
+            f"Failed: {self.counts['failed']}\n"
+            f"Removed (blocked/deleted): {self.counts['removed']}"
+        )
+
+    async def edit_status(self, done=False):
+        try:
+            await self.bot.edit_message_text(self.job["status_chat_id"], self.job["status_message_id"], self.status_text(done))
+        except Exception as e:
+            logging.warning(f"Could not update broadcast status: {e}")
+
+    async def report_progress(self):
+        while True:
+            await asyncio.sleep(BROADCAST_STATUS_INTERVAL)
+            await self.edit_status()
+
+    async def run(self):
+        reporter = asyncio.create_task(self.report_progress())
+        try:
+            last_id = self.job.get("last_user_id")
+            while True:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                batch = await users_collection.find(query, {"user_id": 1}).sort("_id", 1).limit(BROADCAST_BATCH_SIZE).to_list(length=None)
+                if not batch:
+                    break
+
+                gone = []
+                await asyncio.gather(*(self.send(user["user_id"], gone) for user in batch))
+                if gone:
+                    await users_collection.delete_many({"user_id": {"$in": gone}})
+
+                # Recover the configured rate after a clean batch
+                self.bucket.rate = min(BROADCAST_RATE, self.bucket.rate * 1.25)
+                last_id = batch[-1]["_id"]
+                await broadcasts.update_one({"_id": self.job["_id"]}, {"$set": {"last_user_id": last_id, **self.counts}})
+
+            await broadcasts.update_one(
+                {"_id": self.job["_id"]},
+                {"$set": {"status": "done", "finished_at": datetime.datetime.now(datetime.timezone.utc), **self.counts}},
+            )
+        finally:
+            reporter.cancel()
+        await self.edit_status(done=True)
+
+
+async def start_broadcast(bot, message):
+    status = await message.reply_text("Starting broadcast...")
+    job = {
+        "text": message.reply_to_message.text.markdown,
+        "status": "running",
+        "status_chat_id": status.chat.id,
+        "status_message_id": status.id,
+        "total": await users_collection.count_documents({}),
+        "last_user_id": None,
+        "success": 0,
+        "failed": 0,
+        "removed": 0,
+        "created_at": datetime.datetime.now(datetime.timezone.utc),
+    }
+    result = await broadcasts.insert_one(job)
+    job["_id"] = result.inserted_id
+    await BroadcastRun(bot, job).run()
+
+
+async def resume_broadcasts(bot):
+    async for job in broadcasts.find({"status": "running"}):
+        logging.info(f"Resuming broadcast {job['_id']}")
+        spawn(BroadcastRun(bot, job).run(), name=f"broadcast {job['_id']}")
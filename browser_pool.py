@@ -0,0 +1,170 @@
+import os
+import queue
+import asyncio
+import threading
+import atexit
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from metrics import timed
+
+# Browser pool configuration
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH")  # Leave empty to let Selenium Manager resolve it
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "50"))  # Recycle a driver after this many pages
+BROWSER_CHECKOUT_TIMEOUT = float(os.getenv("BROWSER_CHECKOUT_TIMEOUT", "120"))
+BROWSER_PAGE_TIMEOUT = int(os.getenv("BROWSER_PAGE_TIMEOUT", "30"))
+
+
+def setup_selenium():
+    # Selenium is only imported once a page actually needs the browser
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_service = Service(CHROMEDRIVER_PATH) if CHROMEDRIVER_PATH else Service()
+    driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
+    driver.set_page_load_timeout(BROWSER_PAGE_TIMEOUT)
+    return driver
+
+
+class PooledDriver:
+    def __init__(self, slot):
+        self.slot = slot
+        self.driver = None
+        self.pages = 0
+
+    @timed("browser.start")
+    def start(self):
+        self.driver = setup_selenium()
+        self.pages = 0
+        logging.info(f"Browser #{self.slot} started")
+
+    def stop(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logging.warning(f"Error closing browser #{self.slot}: {e}")
+        self.driver = None
+        self.pages = 0
+
+    def is_healthy(self):
+        from selenium.common.exceptions import WebDriverException
+
+        if self.driver is None:
+            return False
+        try:
+            # Any round-trip to the driver fails once Chrome has crashed
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+
+class BrowserPool:
+    def __init__(self, size=BROWSER_POOL_SIZE, max_pages=BROWSER_MAX_PAGES, checkout_timeout=BROWSER_CHECKOUT_TIMEOUT):
+        self.size = size
+        self.max_pages = max_pages
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue.Queue(maxsize=size)
+        self._slots = [PooledDriver(i) for i in range(size)]
+        self._closed = False
+        for slot in self._slots:
+            # Drivers are started lazily on first checkout
+            self._idle.put(slot)
+
+    def checkout(self):
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        try:
+            pooled = self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No browser available after {self.checkout_timeout}s")
+
+        try:
+            if pooled.pages >= self.max_pages:
+                logging.info(f"Recycling browser #{pooled.slot} after {pooled.pages} pages")
+                pooled.stop()
+            elif pooled.driver is not None and not pooled.is_healthy():
+                logging.warning(f"Browser #{pooled.slot} failed health check, restarting")
+                pooled.stop()
+            if pooled.driver is None:
+                pooled.start()
+        except Exception:
+            pooled.stop()
+            self._idle.put(pooled)
+            raise
+        return pooled
+
+    def checkin(self, pooled, broken=False):
+        if broken or self._closed:
+            pooled.stop()
+        self._idle.put(pooled)
+
+    @contextmanager
+    def driver(self):
+        from selenium.common.exceptions import WebDriverException
+
+        pooled = self.checkout()
+        broken = False
+        try:
+            yield pooled.driver
+            pooled.pages += 1
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.checkin(pooled, broken=broken)
+
+    def fetch(self, url):
+        with self.driver() as driver:
+            driver.get(url)
+            html = driver.page_source
+            # Reuse the same tab for the next page, but drop the heavy DOM now
+            driver.get("about:blank")
+            return html
+
+    def close(self):
+        self._closed = True
+        for pooled in self._slots:
+            pooled.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+                atexit.register(_pool.close)
+    return _pool
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                # Extra threads would only block on checkout, so size it like the pool
+                _executor = ThreadPoolExecutor(max_workers=BROWSER_POOL_SIZE, thread_name_prefix="browser")
+    return _executor
+
+
+@timed("browser.fetch")
+async def fetch_page(url):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), get_pool().fetch, url)
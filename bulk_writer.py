@@ -0,0 +1,59 @@
+import asyncio
+import os
+import logging
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "1"))  # Seconds a queued update may wait
+
+
+class BulkWriter:
+    # Collects updates and sends them as unordered bulk writes, flushed by size or by age
+    def __init__(self, target, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL):
+        self.target = target
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.round_trips = 0
+        self.written = 0
+        self._flusher = None
+        self._closing = None
+
+    async def __aenter__(self):
+        self._closing = asyncio.Event()
+        self._flusher = asyncio.create_task(self.flush_periodically())
+        return self
+
+    async def __aexit__(self, *exc):
+        # Let the flusher finish a write in progress rather than cancelling it mid-batch
+        self._closing.set()
+        await self._flusher
+        await self.flush()
+
+    async def update_one(self, query, update):
+        self.pending.append(UpdateOne(query, update))
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        # Swap first so updates queued during the write go into the next batch
+        batch, self.pending = self.pending, []
+        self.round_trips += 1
+        try:
+            result = await self.target.bulk_write(batch, ordered=False)
+            self.written += result.modified_count
+        except BulkWriteError as e:
+            self.written += e.details.get("nModified", 0)
+            logging.error(f"{len(e.details.get('writeErrors', []))} of {len(batch)} updates failed: {e.details.get('writeErrors', [])[:1]}")
+        except Exception as e:
+            logging.error(f"Error writing {len(batch)} updates: {e}")
+
+    async def flush_periodically(self):
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
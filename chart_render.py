@@ -0,0 +1,30 @@
+# Kept free of project imports: this module is loaded by the chart worker processes
+import io
+
+
+def render_price_chart(title, points):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
+    times = [t for t, _ in points]
+    prices = [p for _, p in points]
+
+    fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
+    try:
+        # Prices only change at the recorded points, so draw them as steps
+        ax.step(times, prices, where="post", color="#2a7ae2", linewidth=2)
+        ax.scatter(times, prices, color="#2a7ae2", s=12)
+        ax.set_title(title if len(title) <= 60 else title[:57] + "...", fontsize=11)
+        ax.set_ylabel("Price (₹)")
+        ax.grid(True, alpha=0.3)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%d %b"))
+        fig.autofmt_xdate()
+        fig.tight_layout()
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
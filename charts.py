@@ -0,0 +1,67 @@
+import asyncio
+import datetime
+import io
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from chart_render import render_price_chart
+from db import chart_cache
+from price_history import price_series
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_WINDOW = datetime.timedelta(days=int(os.getenv("CHART_WINDOW_DAYS", "90")))
+
+_executor = None
+
+
+def get_chart_executor():
+    global _executor
+    if _executor is None:
+        # Spawned rather than forked so workers don't inherit the bot's threads and sockets
+        _executor = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def chart_cache_key(product):
+    changed = product.get("last_changed_at")
+    stamp = int(changed.timestamp()) if changed else 0
+    return f"{product['_id']}:{stamp}"
+
+
+async def render_chart(product):
+    points = await price_series(product["_id"], CHART_WINDOW)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    # Extend the last known price to now so the chart ends at the current price
+    points.append((now, float(product["price"])))
+    if len(points) < 2:
+        return None
+
+    loop = asyncio.get_running_loop()
+    png = await loop.run_in_executor(get_chart_executor(), render_price_chart, product["product_name"], points)
+    photo = io.BytesIO(png)
+    photo.name = "price_history.png"
+    return photo
+
+
+async def reply_with_chart(message, product, caption):
+    key = chart_cache_key(product)
+    cached = await chart_cache.find_one({"_id": key})
+    if cached:
+        try:
+            # Already uploaded for this price change: resend by file_id, no rendering or upload
+            return await message.reply_photo(cached["file_id"], caption=caption)
+        except Exception as e:
+            logging.warning(f"Cached chart {key} could not be reused: {e}")
+
+    photo = await render_chart(product)
+    if photo is None:
+        return await message.reply_text(caption, disable_web_page_preview=True)
+
+    sent = await message.reply_photo(photo, caption=caption)
+    await chart_cache.update_one(
+        {"_id": key},
+        {"$set": {"file_id": sent.photo.file_id, "created_at": datetime.datetime.now(datetime.timezone.utc)}},
+        upsert=True,
+    )
+    return sent
@@ -0,0 +1,150 @@
+from bson import ObjectId
+from dotenv import load_dotenv
+import asyncio
+import datetime
+import os
+import logging
+from priority import BASE_CHECK_INTERVAL
+
+load_dotenv()
+
+# One client per process, opened by connect() at startup (or on first use)
+dbclient = None
+
+
+def connect():
+    global dbclient
+    if dbclient is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        dbclient = AsyncIOMotorClient(os.getenv("MONGO_URI"), tz_aware=True)
+    return dbclient
+
+
+class LazyCollection:
+    # Stands in for a collection so importing db neither opens a client nor resolves DNS
+    def __init__(self, name):
+        self._name = name
+        self._collection = None
+
+    def __getattr__(self, attr):
+        if self._collection is None:
+            self._collection = connect()[os.getenv("DATABASE")][self._name]
+        return getattr(self._collection, attr)
+
+
+collection = LazyCollection(os.getenv("COLLECTION"))
+PRODUCTS = LazyCollection(os.getenv("PRODUCTS"))
+users_collection = LazyCollection("Users")
+broadcasts = LazyCollection("Broadcasts")
+link_cache = LazyCollection("LinkCache")
+price_history = LazyCollection("PriceHistory")
+price_history_hourly = LazyCollection("PriceHistoryHourly")
+price_history_daily = LazyCollection("PriceHistoryDaily")
+chart_cache = LazyCollection("ChartCache")
+jobs = LazyCollection("Jobs")
+
+# Price history retention (days)
+RAW_HISTORY_RETENTION = int(os.getenv("RAW_HISTORY_RETENTION", "14"))
+HOURLY_HISTORY_RETENTION = int(os.getenv("HOURLY_HISTORY_RETENTION", "120"))
+DAILY_HISTORY_RETENTION = int(os.getenv("DAILY_HISTORY_RETENTION", "730"))
+
+
+async def ensure_indexes():
+    indexes = [
+        (collection, [("user_id", 1)], {}),
+        (collection, [("user_id", 1), ("product_id", 1)], {"unique": True}),
+        (collection, [("product_id", 1)], {}),
+        (PRODUCTS, [("product_key", 1)], {"unique": True, "partialFilterExpression": {"product_key": {"$exists": True}}}),
+        (PRODUCTS, [("product_name", 1)], {}),
+        (PRODUCTS, [("next_check_at", 1)], {}),
+        (PRODUCTS, [("platform", 1), ("next_check_at", 1)], {}),
+        (users_collection, [("user_id", 1)], {}),
+        (broadcasts, [("status", 1)], {}),
+        (link_cache, [("expires_at", 1)], {"expireAfterSeconds": 0}),
+        (price_history, [("product_id", 1), ("day", 1)], {"unique": True}),
+        (price_history, [("day", 1)], {"expireAfterSeconds": RAW_HISTORY_RETENTION * 86400}),
+        (price_history_hourly, [("product_id", 1), ("hour", 1)], {"unique": True}),
+        (price_history_hourly, [("hour", 1)], {"expireAfterSeconds": HOURLY_HISTORY_RETENTION * 86400}),
+        (price_history_daily, [("product_id", 1), ("day", 1)], {"unique": True}),
+        (price_history_daily, [("day", 1)], {"expireAfterSeconds": DAILY_HISTORY_RETENTION * 86400}),
+        (chart_cache, [("created_at", 1)], {"expireAfterSeconds": 30 * 86400}),
+        (jobs, [("status", 1), ("available_at", 1)], {}),
+        (jobs, [("status", 1), ("lease_expires_at", 1)], {}),
+        (jobs, [("product_id", 1)], {"unique": True, "partialFilterExpression": {"active": True}}),
+        (jobs, [("status", 1), ("notified", 1)], {}),
+        (jobs, [("finished_at", 1)], {"expireAfterSeconds": 86400}),
+    ]
+
+    async def create(target, keys, options):
+        try:
+            await target.create_index(keys, **options)
+        except Exception as e:
+            # A failed index (e.g. existing duplicates) must not keep the bot from starting
+            logging.error(f"Error creating index {keys} on {target.name}: {e}")
+
+    await asyncio.gather(*(create(target, keys, options) for target, keys, options in indexes))
+
+
+async def fetch_user_products(user_id):
+    # One round-trip: join each tracking with its global product
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$lookup": {"from": PRODUCTS.name, "localField": "product_id", "foreignField": "_id", "as": "product"}},
+        {"$unwind": "$product"},
+        {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$product", {"product_id": "$_id", "alerts": "$alerts"}]}}},
+        # Only what the listing shows, not the cache and scheduling fields
+        {"$project": {"product_id": 1, "product_name": 1, "url": 1, "price": 1, "alerts": 1}},
+    ]
+    return await collection.aggregate(pipeline).to_list(length=None)
+
+
+async def fetch_tracking(_id):
+    return await collection.find_one({"_id": ObjectId(_id)})
+
+
+async def upsert_product(query, new_product):
+    # Returns (product id, created)
+    result = await PRODUCTS.update_one(query, {"$setOnInsert": new_product}, upsert=True)
+    if result.upserted_id is not None:
+        return result.upserted_id, True
+    existing = await PRODUCTS.find_one(query, {"_id": 1})
+    return existing["_id"], False
+
+
+async def upsert_tracking(user_id, product_id):
+    # Returns (tracking id, created)
+    result = await collection.update_one(
+        {"user_id": user_id, "product_id": product_id},
+        {"$setOnInsert": {"user_id": user_id, "product_id": product_id}},
+        upsert=True,
+    )
+    if result.upserted_id is not None:
+        # One more watcher; a product nobody watched may be idling at the longest interval
+        soon = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=BASE_CHECK_INTERVAL)
+        await PRODUCTS.update_one({"_id": product_id}, {"$inc": {"watchers": 1}, "$min": {"next_check_at": soon}})
+        return result.upserted_id, True
+    existing = await collection.find_one({"user_id": user_id, "product_id": product_id}, {"_id": 1})
+    return existing["_id"], False
+
+
+async def set_tracking_alerts(_id, user_id, alerts):
+    result = await collection.update_one(
+        {"_id": ObjectId(_id), "user_id": int(user_id)},
+        {"$set": {f"alerts.{name}": value for name, value in alerts.items()}},
+    )
+    return result.matched_count > 0
+
+
+async def clear_tracking_alerts(_id, user_id):
+    result = await collection.update_one({"_id": ObjectId(_id), "user_id": int(user_id)}, {"$unset": {"alerts": ""}})
+    return result.matched_count > 0
+
+
+async def delete_tracking(_id, user_id):
+    tracking = await collection.find_one_and_delete({"_id": ObjectId(_id), "user_id": int(user_id)}, projection={"product_id": 1})
+    if tracking is None:
+        return False
+    # Counts from before the migration can be short, don't let them go negative
+    await PRODUCTS.update_one({"_id": tracking["product_id"], "watchers": {"$gt": 0}}, {"$inc": {"watchers": -1}})
+    return True
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import re
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from lxml import html as lxml_html
+from lxml.etree import XPath, ParserError
+from metrics import timed
+
+
+def has_class(name):
+    # XPath predicate for an element carrying the CSS class `name`
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+price_number_pattern = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+# Compiled selectors per platform, built on first use in each process
+_compiled = {}
+
+
+def _first_text(tree, selectors):
+    for selector in selectors:
+        for node in selector(tree):
+            text = node if isinstance(node, str) else node.text_content()
+            text = text.strip()
+            if text:
+                return text
+    return None
+
+
+def _to_price(text):
+    match = price_number_pattern.search(text)
+    if not match:
+        return None
+    return float(match.group(0).replace(',', ''))
+
+
+def extract(platform, html, selectors):
+    # Returns (price, product_name, price_text); selectors come from the platform's scraper plugin.
+    # price_text is the number as it appears in the page, so callers can tell where the price came from
+    compiled = _compiled.get(platform)
+    if compiled is None:
+        compiled = _compiled[platform] = {field: [XPath(expr) for expr in exprs] for field, exprs in selectors.items()}
+    selectors = compiled
+    try:
+        tree = lxml_html.fromstring(html)
+    except (ParserError, ValueError) as e:
+        logging.error(f"Could not parse {platform} page: {e}")
+        return None, None, None
+
+    product_name = _first_text(tree, selectors["title"]) or "Unknown Product"
+
+    price_text = _first_text(tree, selectors["price"])
+    if not price_text:
+        logging.warning("No price elements found")
+        return None, product_name, None
+
+    match = price_number_pattern.search(price_text)
+    matched_text = match.group(0) if match else None
+
+    if "fraction" in selectors and "." not in price_text.rstrip("."):
+        fraction = _first_text(tree, selectors["fraction"])
+        price_text = price_text.rstrip(".") + ("." + fraction if fraction and fraction.isdigit() else "")
+
+    price = _to_price(price_text)
+    if price is None:
+        logging.error(f"Value conversion failed: {price_text!r}")
+    return price, product_name, matched_text
+
+
+_executor = None
+
+
+def get_extract_executor():
+    global _executor
+    if _executor is None and EXTRACT_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+@timed("extract")
+async def extract_async(platform, html, selectors):
+    # EXTRACT_WORKERS=0 parses on the default thread pool instead of in worker processes
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_extract_executor(), extract, platform, html, selectors)
@@ -0,0 +1,86 @@
+import hashlib
+from collections import Counter
+
+# How much HTML around each marker counts as the price region
+REGION_BEFORE = 200
+REGION_AFTER = 1500
+
+# Outcomes of cached fetches: "not_modified", "same_hash" or "fetched"
+skip_stats = Counter()
+
+
+def cache_from_product(product):
+    return {
+        "etag": product.get("fetch_etag"),
+        "last_modified": product.get("fetch_last_modified"),
+        "region_hash": product.get("region_hash"),
+    }
+
+
+def cache_updates(cache):
+    return {
+        "fetch_etag": cache.get("etag"),
+        "fetch_last_modified": cache.get("last_modified"),
+        "region_hash": cache.get("region_hash"),
+    }
+
+
+def price_region(html, markers):
+    windows = []
+    for marker in markers:
+        index = html.find(marker)
+        if index != -1:
+            windows.append(html[max(0, index - REGION_BEFORE):index + REGION_AFTER])
+    return "".join(windows) if windows else None
+
+
+def region_hash(region):
+    return hashlib.blake2b(region.encode("utf-8", "ignore"), digest_size=16).hexdigest()
+
+
+def page_digest(html, cache, markers):
+    # Returns (digest, region); only worth computing when there is a cache to compare against
+    if cache is None:
+        return None, None
+    region = price_region(html, markers)
+    return (region_hash(region), region) if region is not None else (None, None)
+
+
+def is_unchanged(cache, digest):
+    if cache is None or digest is None:
+        return False
+    if digest == cache.get("region_hash"):
+        cache["unchanged"] = True
+        skip_stats["same_hash"] += 1
+        return True
+    return False
+
+
+def remember_digest(cache, digest, region, price_text):
+    # Called once the page parsed successfully, so a broken page is never treated as the baseline.
+    # When the price came from outside the hashed region (a fallback selector), the hash can't see
+    # it change, so the page must never be skipped.
+    if cache is not None:
+        covered = region is not None and bool(price_text) and price_text in region
+        cache["region_hash"] = digest if covered else None
+        skip_stats["fetched"] += 1
+
+
+def forget_validators(cache):
+    # The HTTP response had no price, so a 304 for it must not skip the browser next time
+    if cache is not None:
+        cache["etag"] = None
+        cache["last_modified"] = None
+
+
+def not_modified(cache):
+    if cache is not None and cache.get("not_modified"):
+        cache["unchanged"] = True
+        skip_stats["not_modified"] += 1
+        return True
+    return False
+
+
+def skip_rate():
+    total = sum(skip_stats.values())
+    return (skip_stats["not_modified"] + skip_stats["same_hash"]) / total * 100 if total else 0.0
@@ -1,34 +1,33 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from bson import ObjectId
+from db import (
+    PRODUCTS,
+    fetch_user_products,
+    fetch_tracking,
+    upsert_product,
+    upsert_tracking,
+    delete_tracking,
+    set_tracking_alerts,
+    clear_tracking_alerts,
+)
 import logging
+import datetime
+import math
+from priority import BASE_CHECK_INTERVAL
+from price_history import record_price
+from metrics import timed
 
-dbclient = AsyncIOMotorClient(os.getenv("MONGO_URI"))
-database = dbclient[os.getenv("DATABASE")]
-collection = database[os.getenv("COLLECTION")]
-PRODUCTS = database[os.getenv("PRODUCTS")]
-
+@timed("db.fetch_all_products")
 async def fetch_all_products(user_id):
     try:
-        cursor = collection.find({"user_id": user_id})
-        products = await cursor.to_list(length=None)
-
-        global_products = []
-        for product in products:
-            global_product = await PRODUCTS.find_one({"_id": product.get("product_id")})
-            if global_product:
-                global_product["product_id"] = product.get("_id")
-                global_products.append(global_product)
-
-        return global_products
+        return await fetch_user_products(user_id)
 
     except Exception as e:
         logging.error(f"Error fetching products: {str(e)}")
         return []
 
+@timed("db.fetch_one_product")
 async def fetch_one_product(_id):
     try:
-        product = await collection.find_one({"_id": ObjectId(_id)})
+        product = await fetch_tracking(_id)
         if product:
             global_product = await PRODUCTS.find_one({"_id": product.get("product_id")})
             return global_product, None  # Return the product and None for error
@@ -40,49 +39,50 @@ async def fetch_one_product(_id):
         logging.error(f"Error fetching product: {str(e)}")
         return None, None  # Return None for both values
 
-async def add_new_product(user_id, product_name, product_url, initial_price):
+@timed("db.add_new_product")
+async def add_new_product(user_id, product_name, product_url, initial_price, product_key=None, platform=None):
     try:
-        existing_global_product = await PRODUCTS.find_one({"product_name": product_name})
-        if not existing_global_product:
-            global_new_product = {
-                "product_name": product_name,
-                "url": product_url,
-                "price": initial_price,
-                "previous_price": initial_price,
-                "upper": initial_price,
-                "lower": initial_price,
-            }
-            insert_result = await PRODUCTS.insert_one(global_new_product)
-            existing_global_product = {"_id": insert_result.inserted_id}
-
-        existing_product = await collection.find_one(
-            {"user_id": user_id, "product_id": existing_global_product["_id"]}
-        )
-
-        if existing_product:
-            logging.info("Product already exists.")
-            return existing_product["_id"]
-
-        new_local_product = {
-            "user_id": user_id,
-            "product_id": existing_global_product["_id"],
+        now = datetime.datetime.now(datetime.timezone.utc)
+        global_new_product = {
+            "product_name": product_name,
+            "url": product_url,
+            "price": initial_price,
+            "previous_price": initial_price,
+            "upper": initial_price,
+            "lower": initial_price,
+            "last_checked_at": now,
+            "last_changed_at": now,
+            "next_check_at": now + datetime.timedelta(seconds=BASE_CHECK_INTERVAL),
         }
-
-        result = await collection.insert_one(new_local_product)
+        if platform:
+            global_new_product["platform"] = platform
+        if product_key:
+            global_new_product["product_key"] = product_key
+            query = {"product_key": product_key}
+        else:
+            # Links we can't identify fall back to matching on the scraped name
+            query = {"product_name": product_name, "product_key": {"$exists": False}}
+        product_id, product_created = await upsert_product(query, global_new_product)
+        if product_created:
+            # The first price is the start of the product's history
+            await record_price(product_id, initial_price, now)
+
+        tracking_id, created = await upsert_tracking(user_id, product_id)
+        if not created:
+            logging.info("Product already exists.")
+            return tracking_id
 
         logging.info("Product added successfully.")
-        return result.inserted_id
+        return tracking_id
 
     except Exception as e:
         logging.error(f"Error adding product: {str(e)}")
         return None
 
+@timed("db.delete_one")
 async def delete_one(_id, user_id):
     try:
-        product = await collection.find_one({"_id": ObjectId(_id)})
-
-        if product and product.get("user_id") == int(user_id):
-            await collection.delete_one({"_id": ObjectId(_id)})
+        if await delete_tracking(_id, user_id):
             return True
         else:
             logging.warning(f"Product with ID {_id} not found or user ID mismatch.")
@@ -91,3 +91,38 @@ async def delete_one(_id, user_id):
     except Exception as e:
         logging.error(f"Error deleting product: {str(e)}")
         return None
+
+def parse_alert_rules(args):
+    # "1500" -> target price, "10%" -> percentage drop, "low" -> notify on new low
+    alerts = {}
+    for arg in args:
+        arg = arg.strip().lower()
+        if arg in ("low", "newlow", "new_low"):
+            alerts["new_low"] = True
+        elif arg.endswith("%"):
+            alerts["drop_percent"] = float(arg[:-1])
+            if not math.isfinite(alerts["drop_percent"]) or alerts["drop_percent"] <= 0:
+                raise ValueError(f"Drop percentage must be a positive number: {arg}")
+        else:
+            alerts["target_price"] = float(arg.replace(',', '').replace('₹', ''))
+            if not math.isfinite(alerts["target_price"]) or alerts["target_price"] <= 0:
+                raise ValueError(f"Target price must be a positive number: {arg}")
+    return alerts
+
+@timed("db.set_alerts")
+async def set_alerts(_id, user_id, alerts):
+    try:
+        return await set_tracking_alerts(_id, user_id, alerts)
+
+    except Exception as e:
+        logging.error(f"Error setting alerts: {str(e)}")
+        return None
+
+@timed("db.clear_alerts")
+async def clear_alerts(_id, user_id):
+    try:
+        return await clear_tracking_alerts(_id, user_id)
+
+    except Exception as e:
+        logging.error(f"Error clearing alerts: {str(e)}")
+        return None
@@ -0,0 +1,75 @@
+import os
+import random
+import logging
+from user_agents import USER_AGENTS
+from metrics import timed
+
+# HTTP client configuration
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "8"))
+
+_session = None
+
+
+def random_headers():
+    return {
+        "User-Agent": random.choice(USER_AGENTS),
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-IN,en;q=0.9",
+        "Connection": "keep-alive",
+    }
+
+
+async def get_session():
+    global _session
+    if _session is None or _session.closed:
+        # Imported on first use; aiohttp is a sizeable share of the import time
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_LIMIT_PER_HOST,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        )
+    return _session
+
+
+@timed("http.fetch")
+async def fetch_html(url, cache=None):
+    # With a cache dict, the request is conditional and the validators are stored back into it
+    headers = random_headers()
+    if cache is not None:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    try:
+        session = await get_session()
+        async with session.get(url, headers=headers, allow_redirects=True) as response:
+            if response.status == 304 and cache is not None:
+                cache["not_modified"] = True
+                return None
+            if response.status != 200:
+                logging.warning(f"HTTP {response.status} fetching {url}")
+                return None
+            if cache is not None:
+                cache["etag"] = response.headers.get("ETag")
+                cache["last_modified"] = response.headers.get("Last-Modified")
+            return await response.text()
+    except Exception as e:
+        logging.warning(f"HTTP fetch failed for {url}: {e}")
+        return None
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,129 @@
+import datetime
+import os
+import socket
+import logging
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from db import jobs
+
+JOB_LEASE = int(os.getenv("JOB_LEASE", "300"))  # Seconds a worker may hold a job before it is reclaimed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE = int(os.getenv("JOB_RETRY_BASE", "60"))  # First retry delay, doubled on every attempt
+JOB_RETRY_MAX = int(os.getenv("JOB_RETRY_MAX", "3600"))
+
+# Job states: pending -> running -> done, or back to pending with a delay, or dead after JOB_MAX_ATTEMPTS
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def enqueue_scrapes(product_ids):
+    # Returns how many new jobs were created; products that already have a live job are skipped
+    if not product_ids:
+        return 0
+    now = _now()
+    # "active" is only set while pending/running; a unique index on it keeps one live job per product
+    requests = [
+        UpdateOne(
+            {"product_id": product_id, "active": True},
+            {
+                "$setOnInsert": {
+                    "type": "scrape",
+                    "product_id": product_id,
+                    "active": True,
+                    "status": "pending",
+                    "attempts": 0,
+                    "available_at": now,
+                    "created_at": now,
+                }
+            },
+            upsert=True,
+        )
+        for product_id in product_ids
+    ]
+    try:
+        result = await jobs.bulk_write(requests, ordered=False)
+        return result.upserted_count
+    except BulkWriteError as e:
+        # Duplicate keys are upserts that raced another enqueue, anything else is a real failure
+        errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != 11000]
+        if errors:
+            logging.error(f"{len(errors)} of {len(requests)} job upserts failed: {errors[:1]}")
+        return e.details.get("nUpserted", 0)
+
+
+async def claim(worker):
+    now = _now()
+    return await jobs.find_one_and_update(
+        {
+            "$or": [
+                {"status": "pending", "available_at": {"$lte": now}},
+                # A worker that died mid-job loses its lease
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ]
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker,
+                "claimed_at": now,
+                "lease_expires_at": now + datetime.timedelta(seconds=JOB_LEASE),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def complete(job, result=None):
+    await jobs.update_one(
+        {"_id": job["_id"], "worker": job["worker"]},
+        {
+            # Only jobs that observed a price change need to reach the notifier
+            "$set": {"status": "done", "result": result, "finished_at": _now(), "notified": not (result and result.get("change"))},
+            "$unset": {"active": "", "lease_expires_at": ""},
+        },
+    )
+
+
+async def fail(job, error):
+    now = _now()
+    if job["attempts"] >= JOB_MAX_ATTEMPTS:
+        logging.error(f"Job {job['_id']} is dead after {job['attempts']} attempts: {error}")
+        update = {
+            "$set": {"status": "dead", "last_error": str(error), "failed_at": now},
+            "$unset": {"active": "", "lease_expires_at": ""},
+        }
+    else:
+        delay = min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** (job["attempts"] - 1))
+        update = {
+            "$set": {
+                "status": "pending",
+                "last_error": str(error),
+                "available_at": now + datetime.timedelta(seconds=delay),
+            },
+            "$unset": {"lease_expires_at": ""},
+        }
+    await jobs.update_one({"_id": job["_id"], "worker": job["worker"]}, update)
+
+
+async def claim_result():
+    # Completed jobs whose change event hasn't been handed to the notifier yet
+    return await jobs.find_one_and_update(
+        {"status": "done", "notified": False},
+        {"$set": {"notified": True}},
+        sort=[("finished_at", 1)],
+    )
+
+
+async def queue_depth():
+    counts = {}
+    async for row in jobs.aggregate([{"$match": {"active": True}}, {"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return counts
@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import os
+import time
+import logging
+from collections import OrderedDict, Counter
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from db import link_cache
+from regex_patterns import extract_product_key
+
+LINK_CACHE_SIZE = int(os.getenv("LINK_CACHE_SIZE", "10000"))
+LINK_CACHE_TTL = int(os.getenv("LINK_CACHE_TTL", "3600"))  # In-process entries (seconds)
+LINK_CACHE_DB_TTL = int(os.getenv("LINK_CACHE_DB_TTL", str(7 * 86400)))  # MongoDB entries (seconds)
+
+# Query parameters that only carry tracking information
+TRACKING_PARAMS = {"fbclid", "gclid", "ref", "ref_", "tag", "affid", "affExtParam1", "affExtParam2", "_encoding"}
+
+
+def canonical_url(url):
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith("utm_")
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/") or "/", urlencode(query), ""))
+
+
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LinkCache:
+    def __init__(self, name, maxsize=LINK_CACHE_SIZE, ttl=LINK_CACHE_TTL, db_ttl=LINK_CACHE_DB_TTL):
+        self.name = name
+        self.db_ttl = db_ttl
+        self.local = TTLCache(maxsize, ttl)
+        self.stats = Counter()
+        self._inflight = {}
+
+    async def get_or_fetch(self, url, fetch):
+        # Every link to the same product shares one entry
+        key = extract_product_key(url) or canonical_url(url)
+        value = self.local.get(key)
+        if value is not None:
+            self.stats["local_hits"] += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            # Someone is already resolving this link, wait for their result
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._load(key, url, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key, url, fetch):
+        cache_id = f"{self.name}:{key}"
+        try:
+            doc = await link_cache.find_one({"_id": cache_id})
+        except Exception as e:
+            logging.warning(f"Link cache lookup failed: {e}")
+            doc = None
+
+        if doc:
+            self.stats["db_hits"] += 1
+            self.local.set(key, doc["value"])
+            return doc["value"]
+
+        self.stats["misses"] += 1
+        value = await fetch(url)
+        if value is None:
+            # Failures are not cached so the next request retries upstream
+            return None
+
+        self.local.set(key, value)
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.db_ttl)
+        try:
+            await link_cache.update_one(
+                {"_id": cache_id},
+                {"$set": {"value": value, "expires_at": expires_at}},
+                upsert=True,
+            )
+        except Exception as e:
+            logging.warning(f"Link cache write failed: {e}")
+        return value
+
+    def stats_summary(self):
+        lookups = sum(self.stats[k] for k in ("local_hits", "db_hits", "misses", "coalesced"))
+        hits = lookups - self.stats["misses"]
+        hit_rate = hits / lookups * 100 if lookups else 0.0
+        return (
+            f"{self.name}: {hit_rate:.1f}% hit rate "
+            f"(local {self.stats['local_hits']}, db {self.stats['db_hits']}, "
+            f"coalesced {self.stats['coalesced']}, misses {self.stats['misses']}, size {len(self.local)})"
+        )
+
+
+expand_cache = LinkCache("expand")
+affiliate_cache = LinkCache("affiliate")
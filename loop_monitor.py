@@ -0,0 +1,31 @@
+import asyncio
+import os
+import time
+import logging
+from background import spawn
+
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", os.getenv("DEBUG", "")).lower() in ("1", "true", "yes")
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))  # Seconds
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "1"))
+
+
+async def monitor_loop_lag():
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(LOOP_MONITOR_INTERVAL)
+        lag = time.monotonic() - started - LOOP_MONITOR_INTERVAL
+        if lag > LOOP_LAG_THRESHOLD:
+            logging.warning(f"Event loop lagged by {lag * 1000:.0f}ms")
+
+
+def start_loop_monitor():
+    if not LOOP_MONITOR:
+        return None
+
+    loop = asyncio.get_running_loop()
+    # asyncio's debug mode logs the callback that blocked for longer than the threshold
+    loop.set_debug(True)
+    loop.slow_callback_duration = LOOP_LAG_THRESHOLD
+    logging.getLogger("asyncio").setLevel(logging.WARNING)
+    logging.info(f"Event loop monitor enabled (threshold {LOOP_LAG_THRESHOLD * 1000:.0f}ms)")
+    return spawn(monitor_loop_lag(), name="loop_monitor")
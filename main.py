@@ -1,23 +1,33 @@
 #main.py
 
-from pyrogram import Client, filters
-from pyrogram.types import Message
+from pyrogram import Client, filters, idle
+from pyrogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.errors import MessageNotModified
 from dotenv import load_dotenv
 import os
-import re
+import inspect
 import asyncio
 import schedule
-from pymongo import MongoClient
 import datetime
 import time
 import threading
-import requests
-import json
 import logging
-from scraper import scrape
-from scheduler import check_prices
-from helpers import fetch_all_products, add_new_product, fetch_one_product, delete_one
-from regex_patterns import flipkart_patterns, amazon_patterns, all_url_patterns
+from scraper import scrape, tier_stats
+from scheduler import check_prices, pass_stats, run_result_consumer, SCRAPE_MODE
+from helpers import add_new_product, fetch_one_product, delete_one, parse_alert_rules, set_alerts, clear_alerts
+from db import connect, ensure_indexes, users_collection
+from http_client import get_session, close_session
+from loop_monitor import start_loop_monitor
+from metrics import start_metrics_server
+from link_cache import expand_cache, affiliate_cache
+from fetch_cache import skip_rate
+from notifier import run_notifier
+from background import spawn
+from broadcast import start_broadcast, resume_broadcasts
+from price_history import price_stats
+from charts import reply_with_chart
+from regex_patterns import url_filter_pattern, url_extract_pattern, classify_url
+from trackings_view import get_page, invalidate
 
 # Load environment variables
 load_dotenv()
@@ -27,11 +37,12 @@ bot_token = os.getenv("BOT_TOKEN")
 api_id = os.getenv("API_ID")
 api_hash = os.getenv("API_HASH")
 EARNKARO_API_TOKEN = os.getenv("EARNKARO_API_TOKEN")
-
-# MongoDB connection
-dbclient = MongoClient(os.getenv("MONGO_URI"))
-database = dbclient[os.getenv("DATABASE")]
-users_collection = database["Users"]
+EARNKARO_API_URL = os.getenv("EARNKARO_API_URL", "https://ekaro-api.affiliaters.in/api/converter/public")
+CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", "300"))  # How often due products are dispatched
+MAX_LINKS_PER_MESSAGE = int(os.getenv("MAX_LINKS_PER_MESSAGE", "10"))
+MAX_LINKS_PER_USER = int(os.getenv("MAX_LINKS_PER_USER", "3"))  # Links of one user processed at once
+MAX_LINKS_IN_FLIGHT = int(os.getenv("MAX_LINKS_IN_FLIGHT", "20"))  # Links processed at once across all users
+LINK_ADMISSION_TIMEOUT = float(os.getenv("LINK_ADMISSION_TIMEOUT", "120"))
 
 LOG_CHANNEL_ID = -1002206093759  # Replace with your log channel ID
 ADMINS = [1720819569]  # Replace with actual admin user ID(s)
@@ -47,42 +58,45 @@ async def log_new_user(user_id, username):
         "joined_at": datetime.datetime.now(datetime.timezone.utc)
     }
 
-    existing_user = users_collection.find_one({"user_id": user_id})
-    if not existing_user:
-        users_collection.insert_one(user)
-        return True
-    return False
+    result = await users_collection.update_one({"user_id": user_id}, {"$setOnInsert": user}, upsert=True)
+    return result.upserted_id is not None
+
+# Concurrency limits for incoming links
+user_link_limits = {}  # user_id -> [semaphore, links waiting or running]
+link_admission = None  # Created in run()
 
-# Initialize the bot
-app = Client("PriceTrackerBot", api_id=api_id, api_hash=api_hash, bot_token=bot_token)
+# Created in main(). Spawned extractor and chart workers re-import this module as
+# __mp_main__, so nothing here may build the client or start anything at import.
+app = None
 
 # Function to expand short URLs
-def expand_short_url(short_url):
+async def expand_short_url(short_url):
     try:
-        response = requests.head(short_url, allow_redirects=True)
-        return response.url
+        session = await get_session()
+        async with session.head(short_url, allow_redirects=True) as response:
+            return str(response.url)
     except Exception as e:
         logging.error(f"Error expanding URL: {e}")
         return None
 
 # Function to convert links to affiliate links using EarnKaro API
 async def convert_to_affiliate_link(url):
-    api_url = "https://ekaro-api.affiliaters.in/api/converter/public"
-    payload = json.dumps({
+    api_url = EARNKARO_API_URL
+    payload = {
         "deal": url,
         "convert_option": "convert_only"
-    })
+    }
     headers = {
         'Authorization': f'Bearer {EARNKARO_API_TOKEN}',
-        'Content-Type': 'application/json'
     }
 
     try:
         logging.info(f"Converting URL: {url}")
-        response = requests.post(api_url, headers=headers, data=payload)
-        response_data = response.json()
+        session = await get_session()
+        async with session.post(api_url, headers=headers, json=payload) as response:
+            response_data = await response.json(content_type=None)
         logging.info(f"Response Data: {response_data}")
-        if response.status_code == 200 and response_data.get("success") == 1:
+        if response.status == 200 and response_data.get("success") == 1:
             return response_data.get("data")
         else:
             logging.error(f"Conversion failed: {response_data.get('message')}")
@@ -93,17 +107,17 @@ async def convert_to_affiliate_link(url):
 
 # Function to extract URLs from text
 def extract_urls(text):
-    return re.findall(r'https?://\S+', text)
+    return url_extract_pattern.findall(text)
 
-@app.on_message(filters.command("start") & filters.private)
-async def start(_, message: Message):
+@Client.on_message(filters.command("start") & filters.private)
+async def start(client, message: Message):
     user_id = message.from_user.id
     username = message.from_user.username
 
     # Log new user to MongoDB and notify in the log channel
     is_new_user = await log_new_user(user_id, username)
     if is_new_user:
-        await app.send_message(LOG_CHANNEL_ID, f"New user started the bot: @{username} (ID: {user_id})")
+        await client.send_message(LOG_CHANNEL_ID, f"New user started the bot: @{username} (ID: {user_id})")
 
     text = (
         f"Hello {username}! 🌟\n\n"
@@ -117,7 +131,7 @@ async def start(_, message: Message):
 
     await message.reply_text(text, quote=True)
 
-@app.on_message(filters.command("help") & filters.private)
+@Client.on_message(filters.command("help") & filters.private)
 async def help(_, message: Message):
     text = (
         "Here are the commands you can use with PriceTrackerBot:\n\n"
@@ -125,64 +139,146 @@ async def help(_, message: Message):
         "/my_trackings - Get a list of products you're tracking.\n"
         "/product [ID] - Get details about a specific product.\n"
         "/stop [ID] - Stop tracking a specific product.\n"
+        "/alert [ID] [price|percent%|low] - Only alert on a target price, a drop or a new low.\n"
+        "/clearalert [ID] - Alert on every price change again.\n"
         "/broadcast - Send a message to all users (admin only).\n"
         "/help - Show this help message.\n\n"
         "To start tracking a product, just send the product link. I'll handle the rest!"
     )
     await message.reply_text(text)
 
-@app.on_message(filters.command("broadcast") & filters.user(ADMINS) & filters.reply)
+@Client.on_message(filters.command("broadcast") & filters.user(ADMINS) & filters.reply)
 async def broadcast(bot, message):
-    users = users_collection.find()
-    b_msg = message.reply_to_message
-    total_users = users_collection.count_documents({})
-    success = 0
-    failed = 0
-
-    for user in users:
-        try:
-            await bot.send_message(user["user_id"], b_msg.text.markdown)
-            success += 1
-        except Exception as e:
-            logging.error(f"Failed to send message to {user['user_id']}: {e}")
-            failed += 1
-        await asyncio.sleep(1)  # Avoid hitting rate limits
-
-    await message.reply_text(f"Broadcast completed:\nSuccess: {success}\nFailed: {failed}")
+    # Runs in the background so the handler doesn't hold an update worker for the whole broadcast
+    spawn(start_broadcast(bot, message), name="broadcast")
 
-@app.on_message(filters.command("my_trackings") & filters.private)
+@Client.on_message(filters.command("my_trackings") & filters.private)
 async def track(_, message):
     try:
-        chat_id = message.chat.id
-        text = await message.reply_text("Fetching Your Products...")
-        products = await fetch_all_products(chat_id)
-
-        if products:
-            products_message = "Your Tracked Products:\n\n"
-            for i, product in enumerate(products, start=1):
-                _id = product.get("product_id")
-                product_name = product.get("product_name")
-                product_url = product.get("url")
-                product_price = product.get("price")
-
-                products_message += (
-                    f"🏷️ **Product {i}**: [{product_name}]({product_url})\n\n"
-                    f"💰 **Current Price**: {product_price}\n"
-                    f"❌ Use /stop {_id} to Stop tracking\n\n"
-                )
-
-            await text.edit(products_message, disable_web_page_preview=True)
+        # Pages come from the per-user view cache; Mongo is only read after a change
+        text, page, pages = await get_page(message.chat.id)
+        if text:
+            await message.reply_text(text, reply_markup=trackings_keyboard(page, pages), disable_web_page_preview=True)
         else:
-            await text.edit("No products added yet")
+            await message.reply_text("No products added yet")
     except Exception as e:
         logging.error(f"Error fetching products: {e}")
 
-@app.on_message(filters.regex("|".join(all_url_patterns)) | filters.photo | filters.document)
-async def track_product_url(_, message: Message):
+@Client.on_callback_query(filters.regex(r"^trackings:(\d+)$"))
+async def trackings_page(_, callback_query: CallbackQuery):
+    try:
+        text, page, pages = await get_page(callback_query.message.chat.id, int(callback_query.matches[0].group(1)))
+        await callback_query.answer()
+        if text:
+            await callback_query.message.edit_text(text, reply_markup=trackings_keyboard(page, pages), disable_web_page_preview=True)
+        else:
+            await callback_query.message.edit_text("No products added yet")
+    except MessageNotModified:
+        pass
+    except Exception as e:
+        logging.error(f"Error showing trackings page: {e}")
+
+def trackings_keyboard(page, pages):
+    if pages <= 1:
+        return None
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("« Prev", callback_data=f"trackings:{page - 1}"))
+    buttons.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"trackings:{page}"))
+    if page < pages - 1:
+        buttons.append(InlineKeyboardButton("Next »", callback_data=f"trackings:{page + 1}"))
+    return InlineKeyboardMarkup([buttons])
+
+def get_user_link_limit(user_id):
+    entry = user_link_limits.get(user_id)
+    if entry is None:
+        entry = user_link_limits[user_id] = [asyncio.Semaphore(MAX_LINKS_PER_USER), 0]
+    return entry
+
+async def delete_later(message, delay):
+    await asyncio.sleep(delay)
+    try:
+        await message.delete()
+    except Exception as e:
+        logging.warning(f"Could not delete message: {e}")
+
+async def track_link(chat_id, url, status):
+    platform, is_short_link, product_key = classify_url(url)
+    if platform is None:
+        await status.edit("Only Amazon and Flipkart links are supported.")
+        return
+
+    # Expand short URLs
+    if is_short_link:
+        await status.edit("Expanding the short link...")
+        expanded_url = await expand_cache.get_or_fetch(url, expand_short_url)
+        if not expanded_url:
+            await status.edit("Failed to expand the short URL.")
+            return
+        expanded_platform, _, product_key = classify_url(expanded_url)
+        platform = expanded_platform or platform
+    else:
+        expanded_url = url
+
+    # Convert to affiliate link using EarnKaro
+    await status.edit("Preparing your link...")
+    affiliate_link = await affiliate_cache.get_or_fetch(expanded_url, convert_to_affiliate_link)
+    if not affiliate_link:
+        await status.edit("Failed to convert link to affiliate link.")
+        return
+
+    expanded_url = affiliate_link
+
+    # Scrape product details
+    await status.edit("Fetching product details...")
+    result = await scrape(expanded_url, platform)
+    if result.name and result.price is not None:
+        id = await add_new_product(chat_id, result.name, expanded_url, result.price, product_key, platform)
+        invalidate(chat_id)
+        await status.edit(
+            f'Tracking your product "{result.name}"!\n\n'
+            f"You can use\n /product_{id} to get more information about it."
+        )
+    else:
+        await status.edit("Failed to scrape!!!")
+
+async def process_link(message, url, status):
+    limit = get_user_link_limit(message.chat.id)
+    limit[1] += 1
     try:
-        # Send initial status message
-        status = await message.reply_text("Analysing Your Product... Please Wait!!")
+        async with limit[0]:
+            try:
+                # Admission control: don't let a burst of links queue up behind each other forever
+                await asyncio.wait_for(link_admission.acquire(), LINK_ADMISSION_TIMEOUT)
+            except asyncio.TimeoutError:
+                await status.edit("The bot is busy right now. Please send this link again in a few minutes.")
+                return
+            try:
+                await track_link(message.chat.id, url, status)
+            finally:
+                link_admission.release()
+    except Exception as e:
+        logging.error(f"Error tracking product URL: {e}")
+        await status.edit("An error occurred while processing your request.")
+    finally:
+        limit[1] -= 1
+        if not limit[1]:
+            user_link_limits.pop(message.chat.id, None)
+
+async def process_links(message, urls):
+    statuses = []
+    for i, url in enumerate(urls, start=1):
+        label = f"link {i}/{len(urls)}" if len(urls) > 1 else "your product"
+        statuses.append(await message.reply_text(f"Analysing {label}... Please Wait!!"))
 
+    await asyncio.gather(*(process_link(message, url, status) for url, status in zip(urls, statuses)))
+
+    # Delete the user's message a little later without holding up anything else
+    spawn(delete_later(message, 5))
+
+@Client.on_message(filters.regex(url_filter_pattern) | filters.photo | filters.document)
+async def track_product_url(_, message: Message):
+    try:
         if message.photo or message.document:
             # Notify the user to send only links
             await message.reply_text("Please send only links, not images or documents.")
@@ -194,47 +290,95 @@ async def track_product_url(_, message: Message):
             await message.reply_text("Please send only links, not images or documents.")
             return
 
-        for url in urls:
-            # Expand short URLs
-            if any(re.match(pattern, url) for pattern in flipkart_patterns + amazon_patterns):
-                expanded_url = expand_short_url(url)
-            else:
-                expanded_url = url
-
-            if not expanded_url:
-                await message.reply_text("Failed to expand the short URL.")
-                continue
-
-            # Determine platform
-            platform = "amazon" if any(re.match(pattern, expanded_url) for pattern in amazon_patterns) else "flipkart"
-
-            # Convert to affiliate link using EarnKaro
-            affiliate_link = await convert_to_affiliate_link(expanded_url)
-            if not affiliate_link:
-                await message.reply_text("Failed to convert link to affiliate link.")
-                continue
-
-            expanded_url = affiliate_link
-
-            # Scrape product details
-            product_name, price = await scrape(expanded_url, platform)
-            if product_name and price:
-                id = await add_new_product(message.chat.id, product_name, expanded_url, price)
-                await status.edit(
-                    f'Tracking your product "{product_name}"!\n\n'
-                    f"You can use\n /product_{id} to get more information about it."
-                )
-            else:
-                await status.edit("Failed to scrape!!!")
-
-        # Wait for 5 seconds before deleting the user's message
-        await asyncio.sleep(5)
-        await message.delete()
+        if len(urls) > MAX_LINKS_PER_MESSAGE:
+            await message.reply_text(f"Only the first {MAX_LINKS_PER_MESSAGE} links in a message are tracked.")
+            urls = urls[:MAX_LINKS_PER_MESSAGE]
+
+        # Links are processed in the background so this update worker is free again
+        spawn(process_links(message, urls), name="process_links")
     except Exception as e:
         logging.error(f"Error tracking product URL: {e}")
-        await status.edit("An error occurred while processing your request.")
+        await message.reply_text("An error occurred while processing your request.")
 
-@app.on_message(filters.command("stop") & filters.private)
+@Client.on_message(filters.regex(r"^/product(?:[_\s]+(\w+))?\s*$") & filters.private)
+async def product_details(_, message: Message):
+    try:
+        _id = message.matches[0].group(1)
+        if not _id:
+            await message.reply_text("Please provide a product ID. Usage: /product [ID]")
+            return
+
+        product, _ = await fetch_one_product(_id)
+        if not product:
+            await message.reply_text("Product not found.")
+            return
+
+        stats = await price_stats(product["_id"], datetime.timedelta(days=30))
+        text = (
+            f"🏷️ **{product['product_name']}**\n\n"
+            f"💰 **Current Price**: ₹{float(product['price']):.2f}\n"
+            f"📉 **Lowest**: ₹{float(product.get('lower', product['price'])):.2f}\n"
+            f"📈 **Highest**: ₹{float(product.get('upper', product['price'])):.2f}\n"
+        )
+        if stats:
+            text += f"📊 **30-day average**: ₹{stats['avg']:.2f}\n"
+        if product.get("last_changed_at"):
+            text += f"🕒 **Last change**: {product['last_changed_at']:%d %b %Y %H:%M} UTC\n"
+        text += f"\n[View product]({product['url']})"
+
+        await reply_with_chart(message, product, text)
+    except Exception as e:
+        logging.error(f"Error fetching product details: {e}")
+        await message.reply_text("An error occurred while processing your request. Please try again later.")
+
+@Client.on_message(filters.regex(r"^/alert(?:[_\s]+(\w+))?((?:\s+\S+)*)\s*$") & filters.private)
+async def set_product_alert(_, message: Message):
+    usage = (
+        "Usage: /alert [ID] [rules]\n"
+        " - a price, e.g. 1500: alert when the price drops to ₹1500 or below\n"
+        " - a percentage, e.g. 10%: alert when the price drops by 10% or more\n"
+        " - low: alert when the price hits a new lowest price\n"
+        "Use /clearalert [ID] to get alerts on every change again."
+    )
+    try:
+        _id, args = message.matches[0].group(1), message.matches[0].group(2).split()
+        if not _id or not args:
+            await message.reply_text(usage)
+            return
+
+        try:
+            alerts = parse_alert_rules(args)
+        except ValueError:
+            await message.reply_text(usage)
+            return
+
+        if await set_alerts(_id, message.chat.id, alerts):
+            invalidate(message.chat.id)
+            await message.reply_text("Alert saved. You'll only be notified when it matches.")
+        else:
+            await message.reply_text("Product not found.")
+    except Exception as e:
+        logging.error(f"Error setting alert: {e}")
+        await message.reply_text("An error occurred while processing your request. Please try again later.")
+
+@Client.on_message(filters.regex(r"^/clearalert(?:[_\s]+(\w+))?\s*$") & filters.private)
+async def clear_product_alert(_, message: Message):
+    try:
+        _id = message.matches[0].group(1)
+        if not _id:
+            await message.reply_text("Please provide a product ID. Usage: /clearalert [ID]")
+            return
+
+        if await clear_alerts(_id, message.chat.id):
+            invalidate(message.chat.id)
+            await message.reply_text("Alerts cleared. You'll be notified on every price change.")
+        else:
+            await message.reply_text("Product not found.")
+    except Exception as e:
+        logging.error(f"Error clearing alert: {e}")
+        await message.reply_text("An error occurred while processing your request. Please try again later.")
+
+@Client.on_message(filters.command("stop") & filters.private)
 async def delete_product(_, message: Message):
     try:
         # Check if the message contains the command and an ID
@@ -247,6 +391,7 @@ async def delete_product(_, message: Message):
 
         result = await delete_one(id, message.chat.id)
         if result:
+            invalidate(message.chat.id)
             await status.edit("Product successfully removed.")
         else:
             await status.edit("Product not found or already removed.")
@@ -254,16 +399,75 @@ async def delete_product(_, message: Message):
         logging.error(f"Error removing product: {e}")
         await status.edit("An error occurred while processing your request. Please try again later.")
 
+@Client.on_message(filters.command("stats") & filters.user(ADMINS))
+async def stats(_, message: Message):
+    if pass_stats["duration"] is None:
+        text = "No price check pass has completed yet.\n\n"
+    else:
+        text = (
+            "Last price check pass:\n"
+            f" - Started: {pass_stats['started_at']:%Y-%m-%d %H:%M:%S} UTC\n"
+            f" - Duration: {pass_stats['duration']:.1f}s\n"
+            f" - Checked: {pass_stats['checked']} ({pass_stats['throughput'] or 0:.2f}/s)\n"
+            f" - Updated: {pass_stats['updated']}\n"
+            f" - Failed: {pass_stats['failed']}\n"
+            f" - Unchanged pages skipped: {pass_stats['skipped']} ({skip_rate():.1f}% overall)\n"
+            f" - Write round-trips: {pass_stats['write_round_trips']}\n"
+            f" - Running now: {'yes' if pass_stats['running'] else 'no'}\n\n"
+        )
+
+    tiers = ", ".join(f"{tier} {count}" for tier, count in tier_stats.most_common()) or "none yet"
+    text += (
+        f"Scrapes by fetch tier: {tiers}\n\n"
+        "Link caches:\n"
+        f" - {expand_cache.stats_summary()}\n"
+        f" - {affiliate_cache.stats_summary()}"
+    )
+    await message.reply_text(text)
+
 # Scheduled task to check prices periodically
 async def scheduled_check_prices():
     while True:
-        await check_prices(app)
-        await asyncio.sleep(3600)  # Check prices every hour
+        started = time.monotonic()
+        try:
+            await check_prices(app)
+        except Exception as e:
+            logging.error(f"Price check pass failed: {e}")
+        # Dispatch due products every CHECK_INTERVAL, measured from the start of the previous pass
+        await asyncio.sleep(max(0, CHECK_INTERVAL - (time.monotonic() - started)))
+
+async def run():
+    global link_admission
+    link_admission = asyncio.Semaphore(MAX_LINKS_IN_FLIGHT)
+    start_loop_monitor()
+    connect()
+    await start_metrics_server()
+    await ensure_indexes()
+    # Price checks don't need Telegram, so they start before the login; alerts wait in the queue
+    spawn(scheduled_check_prices(), name="price_checks")
+    await app.start()
+    spawn(run_notifier(app), name="notifier")
+    if SCRAPE_MODE == "queue":
+        spawn(run_result_consumer(), name="result_consumer")
+    await resume_broadcasts(app)
+    await idle()
+    await app.stop()
+    await close_session()
+
+def create_app():
+    client = Client("PriceTrackerBot", api_id=api_id, api_hash=api_hash, bot_token=bot_token)
+    # The handlers above were collected by the Client.on_* decorators
+    for function in list(globals().values()):
+        if not inspect.iscoroutinefunction(function):
+            continue
+        for handler, group in getattr(function, "handlers", []):
+            client.add_handler(handler, group)
+    return client
 
 def main():
-    loop = asyncio.get_event_loop()
-    loop.create_task(scheduled_check_prices())
-    app.run()
+    global app
+    app = create_app()
+    app.run(run())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,203 @@
+import asyncio
+import bisect
+import functools
+import os
+import time
+import logging
+
+# The endpoint is off unless a port is set; with both switches off every helper here is a no-op
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PASS_SUMMARY = os.getenv("METRICS_PASS_SUMMARY", "").lower() in ("1", "true", "yes")
+METRICS_ENABLED = METRICS_PORT > 0 or METRICS_PASS_SUMMARY
+
+PREFIX = "pricetracker_"
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_label_text(key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.functions = {}
+
+    def set(self, value, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+    def set_function(self, function, **labels):
+        # Sampled when the endpoint is scraped, e.g. a queue's qsize
+        self.functions[tuple(sorted(labels.items()))] = function
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        values = dict(self.values)
+        for key, function in self.functions.items():
+            try:
+                values[key] = function()
+            except Exception:
+                continue
+        for key, value in values.items():
+            lines.append(f"{self.name}{_label_text(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # labels -> [bucket counts, count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0, 0.0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += 1
+        series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, count, total) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_count{_label_text(key)} {count}")
+            lines.append(f"{self.name}_sum{_label_text(key)} {total}")
+        return lines
+
+
+durations = Histogram(f"{PREFIX}operation_duration_seconds", "Time spent in instrumented operations")
+operation_errors = Counter(f"{PREFIX}operation_errors_total", "Instrumented operations that raised")
+scrape_results = Counter(f"{PREFIX}scrape_results_total", "Scrapes by platform and result (success, no_price, unchanged, failure)")
+telegram_sends = Counter(f"{PREFIX}telegram_sends_total", "Telegram sends by source and result (success, failure, flood_wait, gone)")
+queue_depth = Gauge(f"{PREFIX}queue_depth", "Items waiting in internal queues")
+registry = [durations, operation_errors, scrape_results, telegram_sends, queue_depth]
+
+
+def timed(operation):
+    # Decorator; returns the function untouched when metrics are disabled
+    def decorator(function):
+        if not METRICS_ENABLED:
+            return function
+
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                except Exception:
+                    operation_errors.inc(operation=operation)
+                    raise
+                finally:
+                    durations.observe(time.perf_counter() - started, operation=operation)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                operation_errors.inc(operation=operation)
+                raise
+            finally:
+                durations.observe(time.perf_counter() - started, operation=operation)
+        return wrapper
+    return decorator
+
+
+def count_scrape(platform, result):
+    if METRICS_ENABLED:
+        scrape_results.inc(platform=platform, result=result)
+
+
+def count_send(source, result):
+    if METRICS_ENABLED:
+        telegram_sends.inc(source=source, result=result)
+
+
+def track_queue(name, queue):
+    if METRICS_ENABLED:
+        queue_depth.set_function(queue.qsize, queue=name)
+
+
+def set_queue_depth(name, depth):
+    if METRICS_ENABLED:
+        queue_depth.set(depth, queue=name)
+
+
+def render():
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    return {key: (series[1], series[2]) for key, series in durations.series.items()}
+
+
+def log_pass_summary(before):
+    # Per-operation call counts and time since the snapshot taken at the start of the pass
+    if not METRICS_PASS_SUMMARY:
+        return
+    rows = []
+    for key, (count, total) in snapshot().items():
+        previous_count, previous_total = before.get(key, (0, 0.0))
+        calls = count - previous_count
+        if calls:
+            rows.append((total - previous_total, calls, dict(key)["operation"]))
+    lines = [
+        f"  {operation:<28} {calls:>7} calls {spent:9.2f}s total {spent / calls * 1000:9.1f}ms avg"
+        for spent, calls, operation in sorted(rows, reverse=True)
+    ]
+    logging.info("Pass timing summary:\n" + "\n".join(lines) if lines else "Pass timing summary: no instrumented calls")
+
+
+async def start_metrics_server():
+    if not METRICS_PORT:
+        return None
+
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    logging.info(f"Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return runner
@@ -0,0 +1,123 @@
+# One-off migration: give every product a product_key and merge products
+# that turn out to be the same ASIN/pid, repointing user trackings. Finally
+# recount each product's watchers from the trackings.
+#
+#   python migrate_product_keys.py --dry-run
+#   python migrate_product_keys.py
+
+import argparse
+import asyncio
+import logging
+from db import collection, PRODUCTS, ensure_indexes
+from bulk_writer import BulkWriter
+from http_client import get_session, close_session
+from regex_patterns import extract_product_key, platform_from_key
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def resolve_url(url):
+    # Stored URLs are usually affiliate short links, follow them to the store
+    try:
+        session = await get_session()
+        async with session.head(url, allow_redirects=True) as response:
+            return str(response.url)
+    except Exception as e:
+        logging.warning(f"Could not resolve {url}: {e}")
+        return None
+
+
+async def product_key_for(product):
+    url = product.get("url") or ""
+    key = extract_product_key(url)
+    if key is None and url:
+        resolved = await resolve_url(url)
+        key = extract_product_key(resolved) if resolved else None
+    return key
+
+
+async def merge(keep, duplicate, dry_run):
+    moved = dropped = 0
+    async for tracking in collection.find({"product_id": duplicate["_id"]}):
+        already = await collection.find_one({"user_id": tracking["user_id"], "product_id": keep["_id"]}, {"_id": 1})
+        if already:
+            dropped += 1
+            if not dry_run:
+                await collection.delete_one({"_id": tracking["_id"]})
+        else:
+            moved += 1
+            if not dry_run:
+                await collection.update_one({"_id": tracking["_id"]}, {"$set": {"product_id": keep["_id"]}})
+
+    if not dry_run:
+        bounds = {}
+        if duplicate.get("lower") is not None:
+            bounds["$min"] = {"lower": duplicate["lower"]}
+        if duplicate.get("upper") is not None:
+            bounds["$max"] = {"upper": duplicate["upper"]}
+        if bounds:
+            await PRODUCTS.update_one({"_id": keep["_id"]}, bounds)
+        await PRODUCTS.delete_one({"_id": duplicate["_id"]})
+    logging.info(f"Merged {duplicate['_id']} into {keep['_id']}: {moved} trackings moved, {dropped} duplicates dropped")
+
+
+async def count_watchers(dry_run):
+    watchers = {}
+    async for row in collection.aggregate([{"$group": {"_id": "$product_id", "watchers": {"$sum": 1}}}]):
+        watchers[row["_id"]] = row["watchers"]
+    if dry_run:
+        logging.info(f"{len(watchers)} products have watchers")
+        return
+    async with BulkWriter(PRODUCTS) as writer:
+        async for product in PRODUCTS.find({}, {"watchers": 1}):
+            count = watchers.get(product["_id"], 0)
+            if product.get("watchers") != count:
+                await writer.update_one({"_id": product["_id"]}, {"$set": {"watchers": count}})
+    logging.info(f"Watcher counts set on {writer.written} products")
+
+
+async def migrate(dry_run):
+    keyed = {}
+    async for product in PRODUCTS.find({"product_key": {"$exists": True}}, {"product_key": 1, "lower": 1, "upper": 1}):
+        keyed[product["product_key"]] = product
+
+    unresolved = merged = 0
+    # Oldest products first, so the surviving document is the original one
+    async for product in PRODUCTS.find({"product_key": {"$exists": False}}).sort("_id", 1):
+        key = await product_key_for(product)
+        if key is None:
+            unresolved += 1
+            logging.warning(f"No product key for {product['_id']} ({product.get('url')})")
+            continue
+
+        keep = keyed.get(key)
+        if keep is None:
+            keyed[key] = product
+            if not dry_run:
+                await PRODUCTS.update_one(
+                    {"_id": product["_id"]},
+                    {"$set": {"product_key": key, "platform": platform_from_key(key)}},
+                )
+            continue
+
+        await merge(keep, product, dry_run)
+        merged += 1
+
+    logging.info(f"Done: {len(keyed)} unique products, {merged} merged, {unresolved} without a key")
+    await count_watchers(dry_run)
+    if not dry_run:
+        await ensure_indexes()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="Report merges without writing")
+    args = parser.parse_args()
+    try:
+        await migrate(args.dry_run)
+    finally:
+        await close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import logging
+from db import collection
+from trackings_view import apply_price_change
+import metrics
+from metrics import timed
+
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "100"))
+NOTIFY_LINGER = float(os.getenv("NOTIFY_LINGER", "1"))  # Seconds to wait for more events before sending a batch
+
+# Price change events emitted by the price check workers
+change_queue = asyncio.Queue()
+metrics.track_queue("notify", change_queue)
+
+
+def build_change_event(product, product_name, previous_price, current_price):
+    return {
+        "product_id": product["_id"],
+        "product_name": product_name or product.get("product_name"),
+        "url": product["url"],
+        "previous_price": previous_price,
+        "current_price": current_price,
+        # The document is read before the update, so this is the low before this change
+        "previous_lower": float(product.get("lower", previous_price)),
+    }
+
+
+def publish_change(event):
+    apply_price_change(event["product_id"], event["current_price"])
+    change_queue.put_nowait(event)
+
+
+def format_change_message(event):
+    previous_price = event["previous_price"]
+    current_price = event["current_price"]
+    percentage_change = ((current_price - previous_price) / previous_price) * 100 if previous_price else 0.0
+
+    return (
+        f"🎉 Good news! The price of {event['product_name']} has changed.\n"
+        f" - Previous Price: ₹{previous_price:.2f}\n"
+        f" - Current Price: ₹{current_price:.2f}\n"
+        f" - Percentage Change: {percentage_change:.2f}%\n"
+        f" - [Check it out here]({event['url']})"
+    )
+
+
+def alert_filter(event):
+    current_price = event["current_price"]
+    previous_price = event["previous_price"]
+    drop_percent = (previous_price - current_price) / previous_price * 100 if previous_price else 0.0
+
+    # Trackings without rules are alerted on every change
+    rules = [{"alerts": {"$exists": False}}]
+    if current_price < previous_price:
+        # Only when this change crosses the target, not on every change below it
+        rules.append({"alerts.target_price": {"$gte": current_price, "$lt": previous_price}})
+    if drop_percent > 0:
+        rules.append({"alerts.drop_percent": {"$lte": drop_percent}})
+    if current_price < event["previous_lower"]:
+        rules.append({"alerts.new_low": True})
+    return {"product_id": event["product_id"], "$or": rules}
+
+
+async def load_subscribers(events):
+    # One query evaluates the alert rules of every tracking for the whole batch
+    subscribers = {}
+    query = {"$or": [alert_filter(event) for event in events]}
+    cursor = collection.find(query, {"user_id": 1, "product_id": 1})
+    async for tracking in cursor:
+        subscribers.setdefault(tracking["product_id"], []).append(tracking["user_id"])
+    return subscribers
+
+
+@timed("telegram.send")
+async def send_notification(app, user_id, text):
+    await app.send_message(chat_id=user_id, text=text, disable_web_page_preview=True)
+
+
+@timed("notify_batch")
+async def notify_batch(app, events):
+    subscribers = await load_subscribers(events)
+
+    for event in events:
+        # The message is identical for every subscriber, so format it once
+        text = format_change_message(event)
+        for user_id in subscribers.get(event["product_id"], []):
+            try:
+                await send_notification(app, user_id, text)
+                metrics.count_send("notify", "success")
+            except Exception as e:
+                from pyrogram.errors import FloodWait
+
+                metrics.count_send("notify", "flood_wait" if isinstance(e, FloodWait) else "failure")
+                logging.error(f"Failed to notify {user_id} about {event['product_id']}: {e}")
+
+
+async def next_batch():
+    events = [await change_queue.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + NOTIFY_LINGER
+    while len(events) < NOTIFY_BATCH_SIZE:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            events.append(await asyncio.wait_for(change_queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return events
+
+
+async def run_notifier(app):
+    while True:
+        events = await next_batch()
+        try:
+            await notify_batch(app, events)
+        except Exception as e:
+            logging.error(f"Error sending price change notifications: {e}")
@@ -0,0 +1,80 @@
+import os
+import importlib
+from browser_pool import fetch_page
+from http_client import fetch_html
+from fetch_cache import page_digest, is_unchanged, remember_digest, not_modified, forget_validators
+from extractors import extract_async
+from metrics import timed
+
+# Store modules that register a scraper plugin when imported
+SCRAPER_PLUGINS = [name.strip() for name in os.getenv("SCRAPER_PLUGINS", "amazon,flipkart").split(",") if name.strip()]
+
+
+class ScrapeResult:
+    __slots__ = ("price", "name", "tier", "unchanged")
+
+    def __init__(self, price=None, name=None, tier=None, unchanged=False):
+        self.price = price  # float, or None when no price was found
+        self.name = name
+        self.tier = tier  # "http" or "browser"; None when the scrape failed
+        self.unchanged = unchanged  # Same page as last time, nothing was parsed
+
+    def __repr__(self):
+        return f"ScrapeResult(price={self.price!r}, name={self.name!r}, tier={self.tier!r}, unchanged={self.unchanged!r})"
+
+
+class ScraperPlugin:
+    def __init__(self, platform, hosts, short_hosts=(), selectors=None, region_markers=(), fetch="http", concurrency=4, rate=2.0):
+        if fetch not in ("http", "browser"):
+            raise ValueError(f"Unknown fetch strategy for {platform}: {fetch}")
+        self.platform = platform
+        self.hosts = tuple(hosts)
+        self.short_hosts = tuple(short_hosts)
+        self.selectors = selectors or {}
+        self.region_markers = tuple(region_markers)
+        # "http" tries the plain HTTP fetch first and falls back to the browser
+        self.tiers = ("http", "browser") if fetch == "http" else ("browser",)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.scrape = timed(f"{platform}.scrape")(self.scrape)
+
+    async def fetch(self, tier, url, cache):
+        if tier == "http":
+            return await fetch_html(url, cache)
+        return await fetch_page(url)
+
+    async def scrape(self, url, cache=None):
+        for tier in self.tiers:
+            if tier == "browser" and "http" in self.tiers:
+                forget_validators(cache)
+            html = await self.fetch(tier, url, cache)
+            if tier == "http" and not_modified(cache):
+                return ScrapeResult(tier=tier, unchanged=True)
+            if not html:
+                continue
+            digest, region = page_digest(html, cache, self.region_markers)
+            if is_unchanged(cache, digest):
+                return ScrapeResult(tier=tier, unchanged=True)
+            price, product_name, price_text = await extract_async(self.platform, html, self.selectors)
+            if price is not None:
+                remember_digest(cache, digest, region, price_text)
+                return ScrapeResult(price, product_name, tier)
+            if tier == self.tiers[-1]:
+                return ScrapeResult(None, product_name, tier)
+        return ScrapeResult(tier=self.tiers[-1])
+
+
+PLUGINS = {}
+
+
+def register(plugin):
+    PLUGINS[plugin.platform] = plugin
+    return plugin
+
+
+def get_plugin(platform):
+    return PLUGINS.get(platform)
+
+
+for _module in SCRAPER_PLUGINS:
+    importlib.import_module(_module)
@@ -0,0 +1,146 @@
+import asyncio
+import datetime
+import os
+import logging
+from db import price_history, price_history_hourly, price_history_daily
+
+# Raw points are bucketed per product per day; the bucket keeps at most this many
+RAW_POINTS_PER_BUCKET = int(os.getenv("RAW_POINTS_PER_BUCKET", "96"))
+
+# Windows up to these sizes are answered from the finer resolution
+RAW_WINDOW = datetime.timedelta(days=2)
+HOURLY_WINDOW = datetime.timedelta(days=60)
+
+
+def _floor_hour(at):
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(at):
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_update(price, at):
+    return {
+        "$min": {"min": price},
+        "$max": {"max": price},
+        "$inc": {"sum": price, "count": 1},
+        "$set": {"close": price, "last_at": at},
+        "$setOnInsert": {"open": price},
+    }
+
+
+async def record_price(product_id, price, at=None):
+    at = at or datetime.datetime.now(datetime.timezone.utc)
+    price = float(price)
+    day = _floor_day(at)
+    try:
+        # Rollups are maintained incrementally, so recording a change is three upserts
+        await asyncio.gather(
+            price_history.update_one(
+                {"product_id": product_id, "day": day},
+                {
+                    "$push": {"points": {"$each": [{"t": at, "p": price}], "$slice": -RAW_POINTS_PER_BUCKET}},
+                    "$min": {"min": price},
+                    "$max": {"max": price},
+                },
+                upsert=True,
+            ),
+            price_history_hourly.update_one(
+                {"product_id": product_id, "hour": _floor_hour(at)}, _rollup_update(price, at), upsert=True
+            ),
+            price_history_daily.update_one(
+                {"product_id": product_id, "day": day}, _rollup_update(price, at), upsert=True
+            ),
+        )
+    except Exception as e:
+        logging.error(f"Error recording price history for {product_id}: {e}")
+
+
+def _resolution(window):
+    if window <= RAW_WINDOW:
+        return "raw"
+    if window <= HOURLY_WINDOW:
+        return "hourly"
+    return "daily"
+
+
+async def price_before(product_id, at):
+    # Last price recorded before `at`, from the finest history that still covers it
+    bucket = await price_history.find_one(
+        {"product_id": product_id, "day": {"$lte": _floor_day(at)}, "points.t": {"$lt": at}}, sort=[("day", -1)]
+    )
+    if bucket:
+        points = [point for point in bucket["points"] if point["t"] < at]
+        return points[-1]["p"]
+    for field, target in (("hour", price_history_hourly), ("day", price_history_daily)):
+        row = await target.find_one({"product_id": product_id, "last_at": {"$lt": at}}, {"close": 1}, sort=[(field, -1)])
+        if row:
+            return row["close"]
+    return None
+
+
+async def price_stats(product_id, window):
+    # min/max and time-weighted average of the price over the last `window`,
+    # including the price carried in from before the window
+    now = datetime.datetime.now(datetime.timezone.utc)
+    since = now - window
+    resolution = _resolution(window)
+
+    if resolution == "raw":
+        pipeline = [
+            {"$match": {"product_id": product_id, "day": {"$gte": _floor_day(since)}}},
+            {"$unwind": "$points"},
+            {"$match": {"points.t": {"$gte": since}}},
+            {"$group": {"_id": None, "min": {"$min": "$points.p"}, "max": {"$max": "$points.p"}, "count": {"$sum": 1}}},
+        ]
+        target = price_history
+    else:
+        field, target = ("hour", price_history_hourly) if resolution == "hourly" else ("day", price_history_daily)
+        floor = _floor_hour(since) if resolution == "hourly" else _floor_day(since)
+        pipeline = [
+            {"$match": {"product_id": product_id, field: {"$gte": floor}}},
+            {"$group": {"_id": None, "min": {"$min": "$min"}, "max": {"$max": "$max"}, "count": {"$sum": "$count"}}},
+        ]
+
+    rows, series = await asyncio.gather(target.aggregate(pipeline).to_list(length=1), price_series(product_id, window, now))
+    if not series:
+        return None
+
+    # Each price holds until the next one, the last until now
+    weighted = 0.0
+    for (at, price), (next_at, _) in zip(series, series[1:] + [(now, None)]):
+        weighted += price * (next_at - at).total_seconds()
+    duration = (now - series[0][0]).total_seconds()
+    row = rows[0] if rows else {}
+    prices = [price for _, price in series] + [row[bound] for bound in ("min", "max") if row.get(bound) is not None]
+    return {
+        "min": min(prices),
+        "avg": weighted / duration if duration > 0 else series[-1][1],
+        "max": max(prices),
+        "count": row.get("count", 0),
+        "resolution": resolution,
+    }
+
+
+async def price_series(product_id, window, now=None):
+    # (timestamp, price) pairs over the last `window`, at the resolution that fits it,
+    # starting with the price in effect when the window opens
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    since = now - window
+    resolution = _resolution(window)
+
+    if resolution == "raw":
+        series = []
+        async for bucket in price_history.find({"product_id": product_id, "day": {"$gte": _floor_day(since)}}).sort("day", 1):
+            series.extend((point["t"], point["p"]) for point in bucket["points"] if point["t"] >= since)
+    else:
+        field, target = ("hour", price_history_hourly) if resolution == "hourly" else ("day", price_history_daily)
+        cursor = target.find({"product_id": product_id, field: {"$gte": since}}, {field: 1, "close": 1}).sort(field, 1)
+        series = [(row[field], row["close"]) async for row in cursor]
+
+    if not series or series[0][0] > since:
+        carried = await price_before(product_id, since)
+        if carried is not None:
+            series.insert(0, (since, carried))
+    return series
@@ -0,0 +1,46 @@
+import os
+import math
+import datetime
+
+# Adaptive check interval configuration (seconds)
+BASE_CHECK_INTERVAL = int(os.getenv("BASE_CHECK_INTERVAL", "3600"))
+MIN_CHECK_INTERVAL = int(os.getenv("MIN_CHECK_INTERVAL", "900"))
+MAX_CHECK_INTERVAL = int(os.getenv("MAX_CHECK_INTERVAL", "86400"))
+VOLATILITY_SCALE = float(os.getenv("VOLATILITY_SCALE", "2"))  # % change that halves the interval
+VOLATILITY_DECAY = 0.3  # Weight of the newest observation in the volatility average
+
+
+def update_volatility(volatility, previous_price, current_price):
+    # Exponentially weighted average of the absolute % change per check
+    change = abs(current_price - previous_price) / previous_price * 100 if previous_price else 0.0
+    return VOLATILITY_DECAY * change + (1 - VOLATILITY_DECAY) * (volatility or 0.0)
+
+
+def compute_interval(watchers, volatility, last_changed_at, now):
+    if watchers is None or watchers <= 0:
+        # Nobody is waiting for alerts on this product
+        return MAX_CHECK_INTERVAL
+
+    interval = BASE_CHECK_INTERVAL
+    # Popular products are checked more often
+    interval /= 1 + math.log2(watchers)
+    # Volatile products are checked more often
+    interval /= 1 + (volatility or 0.0) / VOLATILITY_SCALE
+    # Products that have not changed in a long time back off
+    if last_changed_at:
+        if last_changed_at.tzinfo is None:
+            last_changed_at = last_changed_at.replace(tzinfo=datetime.timezone.utc)
+        idle_days = max(0.0, (now - last_changed_at).total_seconds() / 86400)
+        interval *= 1 + math.log1p(idle_days)
+
+    return int(min(MAX_CHECK_INTERVAL, max(MIN_CHECK_INTERVAL, interval)))
+
+
+def next_check_at(watchers, volatility, last_changed_at, now=None):
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return now + datetime.timedelta(seconds=compute_interval(watchers, volatility, last_changed_at, now))
+
+
+def due_filter(now=None):
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return {"$or": [{"next_check_at": {"$lte": now}}, {"next_check_at": {"$exists": False}}]}
@@ -1,27 +1,63 @@
 # regex_patterns.py
-flipkart_patterns = [
-    r'https?://www\.flipkart\.com/.+',
-    r'https?://flipkart\.com/.+',
-    r'https?://m\.flipkart\.com/.+',
-    r'https?://dl\.flipkart\.com/.+',
-    r'https?://flipkart\.in/.+',
-    r'https?://www\.flipkart\.in/.+',
-    r'https?://dl\.flipkart\.in/.+',
-    r'https?://m\.flipkart\.in/.+',
-    r'https?://fkrt\.cc/.+',
-    r'https?://fkrt\.co/.+',
-    r'https?://fkrt\.it/.+',
-]
-
-amazon_patterns = [
-    r'https://www\.amazon\.com/.*',
-    r'https://amazon\.com/.*',
-    r'https://www\.amazon\.in/.*',
-    r'https://amazon\.in/.*',
-    r'https://amzn\.in/.*',
-    r'https://amzn\.to/.*',
-    r'https://amzn\.in/.+',
-]
-
-
-all_url_patterns = amazon_patterns + flipkart_patterns
+import re
+from urllib.parse import urlsplit
+from plugins import PLUGINS
+
+# Supported hosts -> (platform, is_short_link), declared by the scraper plugins
+PLATFORM_HOSTS = {}
+for _plugin in PLUGINS.values():
+    PLATFORM_HOSTS.update({host: (_plugin.platform, False) for host in _plugin.hosts})
+    PLATFORM_HOSTS.update({host: (_plugin.platform, True) for host in _plugin.short_hosts})
+
+# Matches any message containing a link to a supported host
+url_filter_pattern = re.compile(
+    r'https?://(?:' + '|'.join(re.escape(host) for host in sorted(PLATFORM_HOSTS, key=len, reverse=True)) + r')/',
+    re.IGNORECASE,
+)
+url_extract_pattern = re.compile(r'https?://\S+')
+url_host_pattern = re.compile(r'https?://([^/\s?#:]+)', re.IGNORECASE)
+
+
+# Product identity: Amazon ASIN and Flipkart pid/itm ids
+amazon_asin_pattern = re.compile(r'/(?:dp|gp/product|gp/aw/d|exec/obidos/asin|o/ASIN)/([A-Z0-9]{10})(?=[/?#]|$)', re.IGNORECASE)
+flipkart_pid_pattern = re.compile(r'[?&]pid=([A-Z0-9]{16})(?=[&#]|$)', re.IGNORECASE)
+flipkart_itm_pattern = re.compile(r'/p/(itm[a-z0-9]+)(?=[/?#]|$)', re.IGNORECASE)
+amazon_host_pattern = re.compile(r'^(?:www\.)?(amazon\.[a-z.]+)$', re.IGNORECASE)
+
+
+def extract_product_key(url):
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().split(':')[0]
+
+    amazon_host = amazon_host_pattern.match(host)
+    if amazon_host:
+        match = amazon_asin_pattern.search(parts.path)
+        # Each Amazon marketplace lists its own offer for an ASIN
+        return f"{amazon_host.group(1)}:{match.group(1).upper()}" if match else None
+
+    if host.endswith("flipkart.com") or host.endswith("flipkart.in"):
+        match = flipkart_pid_pattern.search("?" + parts.query)
+        if match:
+            return f"flipkart:{match.group(1).upper()}"
+        match = flipkart_itm_pattern.search(parts.path)
+        return f"flipkart:{match.group(1).lower()}" if match else None
+
+    return None
+
+
+def classify_url(url):
+    # Returns (platform, is_short_link, product_key); platform is None for unsupported links
+    match = url_host_pattern.match(url)
+    if not match:
+        return None, False, None
+    entry = PLATFORM_HOSTS.get(match.group(1).lower())
+    if entry is None:
+        return None, False, None
+    platform, is_short_link = entry
+    return platform, is_short_link, None if is_short_link else extract_product_key(url)
+
+
+def platform_from_key(product_key):
+    if not product_key:
+        return None
+    return "flipkart" if product_key.startswith("flipkart:") else "amazon"
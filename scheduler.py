@@ -1,20 +1,50 @@
 import asyncio
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
+import datetime
+import time
 import os
 from scraper import scrape
+from plugins import PLUGINS, get_plugin
+from db import PRODUCTS
+from notifier import build_change_event, publish_change
+from price_history import record_price
+from fetch_cache import cache_from_product, cache_updates, skip_rate
+from rate_limit import TokenBucket
+from bulk_writer import BulkWriter
+from priority import due_filter, next_check_at, update_volatility, BASE_CHECK_INTERVAL
+from job_queue import enqueue_scrapes, claim_result, queue_depth
+from regex_patterns import classify_url, platform_from_key
+import metrics
+from metrics import timed
 from dotenv import load_dotenv
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 
-dbclient = AsyncIOMotorClient(os.getenv("MONGO_URI"))
-database = dbclient[os.getenv("DATABASE")]
-collection = database[os.getenv("COLLECTION")]
-PRODUCTS = database[os.getenv("PRODUCTS")]
+# "inline" scrapes in the bot process, "queue" hands products to worker.py processes
+SCRAPE_MODE = os.getenv("SCRAPE_MODE", "inline")
+CHECK_CURSOR_BATCH = int(os.getenv("CHECK_CURSOR_BATCH", "500"))
+
+# Fields a price check reads; the pass never loads whole product documents
+CHECK_PROJECTION = {
+    "product_name": 1,
+    "url": 1,
+    "platform": 1,
+    "product_key": 1,
+    "price": 1,
+    "lower": 1,
+    "upper": 1,
+    "volatility": 1,
+    "watchers": 1,
+    "last_changed_at": 1,
+    "fetch_etag": 1,
+    "fetch_last_modified": 1,
+    "region_hash": 1,
+}
 
 async def convert_price(price):
+    # Stored prices may still be strings from before scrapes returned numbers
     if isinstance(price, str):
         return float(price.replace(',', '').replace('₹', '').strip())
     elif isinstance(price, (int, float)):
@@ -22,80 +52,232 @@ async def convert_price(price):
     else:
         raise ValueError(f"Unsupported price format: {price}")
 
-async def check_prices(app):
-    logging.info("Checking Price for Products...")
-    async for product in PRODUCTS.find():
+def detect_platform(product):
+    # Stored URLs are affiliate links, so prefer what we recorded when the product was added.
+    # None when the store can't be told; migrate_product_keys.py resolves those links.
+    return (
+        product.get("platform")
+        or platform_from_key(product.get("product_key"))
+        or classify_url(product["url"])[0]
+    )
+
+_limiters = {}
+_pass_lock = asyncio.Lock()
+
+# Stats of the most recent price check pass
+pass_stats = {
+    "running": False,
+    "started_at": None,
+    "duration": None,
+    "checked": 0,
+    "updated": 0,
+    "failed": 0,
+    "skipped": 0,
+    "throughput": None,
+    "write_round_trips": 0,
+}
+
+def get_limiter(platform):
+    # Concurrency and request rate (requests per second) are declared by each store's plugin
+    if platform not in _limiters:
+        plugin = get_plugin(platform)
+        concurrency, rate = (plugin.concurrency, plugin.rate) if plugin else (1, 1)
+        _limiters[platform] = (asyncio.Semaphore(concurrency), TokenBucket(rate))
+    return _limiters[platform]
+
+class ScrapeError(Exception):
+    pass
+
+class NoPriceError(ScrapeError):
+    # The page loaded but had no price (out of stock, layout change); retried on the regular schedule
+    pass
+
+@timed("check_product")
+async def check_product(product, stats, writer=PRODUCTS):
+    # writer is the products collection or a BulkWriter batching the updates of a pass
+    # Kept up to date by upsert_tracking/delete_tracking; products from before the counter count as watched
+    watchers = product.get("watchers", 1)
+    platform = detect_platform(product)
+    semaphore, bucket = get_limiter(platform)
+    cache = cache_from_product(product)
+    async with semaphore:
+        await bucket.acquire()
+        result = await scrape(product["url"], platform, cache)
+    stats["checked"] += 1
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    volatility = product.get("volatility", 0.0)
+    last_changed_at = product.get("last_changed_at")
+    schedule = {"last_checked_at": now}
+    if not product.get("platform"):
+        # Backfill so later passes can select this product by platform
+        schedule["platform"] = platform
+
+    if result.unchanged:
+        # Same page as last time: no parsing happened and the price can't have changed
+        stats["skipped"] += 1
+        schedule.update(cache_updates(cache))
+        schedule["volatility"] = update_volatility(volatility, 1.0, 1.0)
+        schedule["next_check_at"] = next_check_at(watchers, schedule["volatility"], last_changed_at, now)
+        await writer.update_one({"_id": product["_id"]}, {"$set": schedule})
+        return None
+
+    product_name = result.name
+    current_price = result.price
+    if current_price is None:
+        # Retry on the regular schedule instead of on every pass
+        schedule["next_check_at"] = next_check_at(watchers, volatility, last_changed_at, now)
+        await writer.update_one({"_id": product["_id"]}, {"$set": schedule})
+        raise NoPriceError(f"No price scraped for product {product['_id']}")
+    try:
+        previous_price = await convert_price(product.get("price", "0"))
+    except ValueError as e:
+        schedule["next_check_at"] = next_check_at(watchers, volatility, last_changed_at, now)
+        await writer.update_one({"_id": product["_id"]}, {"$set": schedule})
+        raise ScrapeError(f"Could not convert price to float: {e}")
+
+    volatility = update_volatility(volatility, previous_price, current_price)
+    schedule["volatility"] = volatility
+    schedule.update(cache_updates(cache))
+
+    if current_price != previous_price:
+        last_changed_at = now
+        schedule.update(
+            {
+                "price": current_price,
+                "previous_price": previous_price,
+                "lower": min(current_price, float(product.get("lower", current_price))),
+                "upper": max(current_price, float(product.get("upper", current_price))),
+                "last_changed_at": now,
+            }
+        )
+        stats["updated"] += 1
+        logging.info(f"Price updated for {product_name}: {previous_price} -> {current_price}")
+        change_event = build_change_event(product, product_name, previous_price, current_price)
+    else:
+        change_event = None
+
+    schedule["next_check_at"] = next_check_at(watchers, volatility, last_changed_at, now)
+    await writer.update_one({"_id": product["_id"]}, {"$set": schedule})
+
+    if change_event:
+        await record_price(product["_id"], current_price, now)
+    return change_event
+
+async def check_worker(queue, stats, writer):
+    while True:
+        product = await queue.get()
+        if product is None:
+            return
         try:
-            product_name, current_price = await scrape(product["url"], "amazon" if "amazon" in product["url"] else "flipkart")
-            await asyncio.sleep(1)
-
-            if current_price is not None:
-                try:
-                    current_price = await convert_price(current_price)
-                    previous_price = await convert_price(product.get("price", "0"))
-                except ValueError as e:
-                    logging.error(f"Could not convert price to float: {e}")
-                    continue
-
-                if current_price != previous_price:
-                    await PRODUCTS.update_one(
-                        {"_id": product["_id"]},
-                        {
-                            "$set": {
-                                "price": current_price,
-                                "previous_price": previous_price,
-                                "lower": min(current_price, float(product.get("lower", current_price))),
-                                "upper": max(current_price, float(product.get("upper", current_price))),
-                            }
-                        },
-                    )
-                    logging.info(f"Price updated for {product_name}: {previous_price} -> {current_price}")
+            change_event = await check_product(product, stats, writer)
+            if change_event:
+                # Subscribers are notified by the notifier stage, not by a second scan
+                publish_change(change_event)
         except Exception as e:
+            stats["failed"] += 1
             logging.error(f"Error checking price for product {product['url']}: {e}")
 
-    logging.info("Completed")
-    changed_products = await compare_prices()
-
-    for changed_product in changed_products:
-        cursor = collection.find({"product_id": changed_product})
-        users = await cursor.to_list(length=None)
-
-        for user in users:
-            product = await PRODUCTS.find_one({"_id": user.get("product_id")})
-            if product:
-                try:
-                    current_price = await convert_price(product["price"])
-                    previous_price = await convert_price(product["previous_price"])
-
-                    percentage_change = ((current_price - previous_price) / previous_price) * 100
-
-                    text = (
-                        f"🎉 Good news! The price of {product['product_name']} has changed.\n"
-                        f" - Previous Price: ₹{previous_price:.2f}\n"
-                        f" - Current Price: ₹{current_price:.2f}\n"
-                        f" - Percentage Change: {percentage_change:.2f}%\n"
-                        f" - [Check it out here]({product['url']})"
-                    )
-
-                    await app.send_message(
-                        chat_id=user.get("user_id"), text=text, disable_web_page_preview=True
-                    )
-                except ValueError as e:
-                    logging.error(f"Error calculating percentage change: {e}")
-
-async def compare_prices():
-    logging.info("Comparing Prices...")
-    product_with_changes = []
-
-    async for product in PRODUCTS.find():
+@timed("check_prices")
+async def check_prices(app):
+    if _pass_lock.locked():
+        logging.warning("Previous price check is still running, skipping this pass")
+        return
+
+    async with _pass_lock:
+        if SCRAPE_MODE == "queue":
+            await enqueue_due_products()
+        else:
+            await run_check_pass(app)
+
+async def enqueue_due_products():
+    logging.info("Queueing due products...")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    queued = 0
+    product_ids = []
+    cursor = PRODUCTS.find(due_filter(now), {"_id": 1}).sort("next_check_at", 1).batch_size(CHECK_CURSOR_BATCH)
+    async with BulkWriter(PRODUCTS) as writer:
+        async for product in cursor:
+            product_ids.append(product["_id"])
+            if len(product_ids) >= CHECK_CURSOR_BATCH:
+                queued += await enqueue_scrapes(product_ids)
+                product_ids = []
+            # Keep it out of the next pass; the worker sets the real next check
+            await writer.update_one(
+                {"_id": product["_id"]},
+                {"$set": {"next_check_at": now + datetime.timedelta(seconds=BASE_CHECK_INTERVAL)}},
+            )
+        queued += await enqueue_scrapes(product_ids)
+    depth = await queue_depth()
+    metrics.set_queue_depth("jobs", depth)
+    logging.info(f"Queued {queued} products, queue depth: {depth}")
+
+async def run_result_consumer(poll_interval=2):
+    # Hands change events found by worker processes to this process's notifier
+    while True:
         try:
-            current_price = await convert_price(product.get("price", "0"))
-            previous_price = await convert_price(product.get("previous_price", "0"))
-        except ValueError as e:
-            logging.error(f"Error converting prices: {e}")
+            job = await claim_result()
+        except Exception as e:
+            logging.error(f"Error reading job results: {e}")
+            job = None
+        if job is None:
+            await asyncio.sleep(poll_interval)
             continue
+        publish_change(job["result"]["change"])
 
-        if current_price != previous_price:
-            product_with_changes.append(product.get("_id"))
+async def dispatch_due_products(queues, query):
+    # Only dispatch products whose next check is due, most overdue first
+    cursor = PRODUCTS.find({**due_filter(), **query}, CHECK_PROJECTION).sort("next_check_at", 1).batch_size(CHECK_CURSOR_BATCH)
+    async for product in cursor:
+        queue = queues.get(detect_platform(product))
+        if queue is None:
+            logging.warning(f"No scraper plugin for product {product['_id']}, skipping")
+            continue
+        await queue.put(product)
+
+async def run_check_pass(app):
+    logging.info("Checking Price for Products...")
+    started = time.monotonic()
+    stats = {"checked": 0, "updated": 0, "failed": 0, "skipped": 0}
+    pass_stats.update(running=True, started_at=datetime.datetime.now(datetime.timezone.utc))
+    timings = metrics.snapshot()
 
-    return product_with_changes
+    # The queues bound how many products are in flight; the writer batches their updates
+    async with BulkWriter(PRODUCTS) as writer:
+        # Each store gets its own bounded queue and as many workers as its concurrency budget,
+        # so a slow or throttled store can't hold up the others
+        queues = {}
+        workers = []
+        for platform, plugin in PLUGINS.items():
+            queues[platform] = asyncio.Queue(maxsize=plugin.concurrency * 2)
+            metrics.track_queue(f"check_{platform}", queues[platform])
+            workers += [asyncio.create_task(check_worker(queues[platform], stats, writer)) for _ in range(plugin.concurrency)]
+        try:
+            await asyncio.gather(
+                *(dispatch_due_products(queues, {"platform": platform}) for platform in queues),
+                # Products added before the platform was stored are routed one by one
+                dispatch_due_products(queues, {"platform": {"$exists": False}}),
+            )
+        finally:
+            for platform, plugin in PLUGINS.items():
+                for _ in range(plugin.concurrency):
+                    await queues[platform].put(None)
+            await asyncio.gather(*workers)
+            pass_stats["running"] = False
+
+    duration = time.monotonic() - started
+    pass_stats.update(
+        duration=duration,
+        throughput=stats["checked"] / duration if duration else None,
+        write_round_trips=writer.round_trips,
+        **stats,
+    )
+    logging.info(
+        f"Checked {stats['checked']} products in {duration:.1f}s "
+        f"({pass_stats['throughput'] or 0:.2f}/s), {stats['updated']} updated, {stats['failed']} failed, "
+        f"{stats['skipped']} unchanged pages skipped ({skip_rate():.1f}% skip rate overall), "
+        f"{writer.round_trips} write round-trips"
+    )
+
+    metrics.log_pass_summary(timings)
+    logging.info("Completed")
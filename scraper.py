@@ -1,25 +1,36 @@
-from amazon import track_prices
-from flipkart import track_flipkart_price
+from plugins import get_plugin, ScrapeResult
+from metrics import timed, count_scrape
+from collections import Counter
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
-async def scrape(url, platform):
+# Number of products served by each tier ("http" or "browser")
+tier_stats = Counter()
+
+@timed("scrape")
+async def scrape(url, platform, cache=None):
     if not url:
         logging.error("URL is None or empty")
-        return None, None
+        return ScrapeResult()
 
     try:
-        if platform == "flipkart":
-            price, product_name = await track_flipkart_price(url)
-        elif platform == "amazon":
-            price, product_name = await track_prices(url)
-        else:
+        plugin = get_plugin(platform)
+        if plugin is None:
             raise ValueError("Unsupported platform")
+        result = await plugin.scrape(url, cache)
 
-        price_str = str(price) if price is not None else "N/A"
-        return product_name, price_str
+        if result.tier:
+            tier_stats[result.tier] += 1
+            logging.info(f"Scraped {platform} product via {result.tier} tier: {url}")
+
+        if result.unchanged:
+            count_scrape(platform, "unchanged")
+        else:
+            count_scrape(platform, "success" if result.price is not None else "no_price")
+        return result
 
     except Exception as e:
         logging.error(f"Error scraping product from {platform}: {e}")
-        return None, None
+        count_scrape(platform, "failure")
+        return ScrapeResult()
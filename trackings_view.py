@@ -0,0 +1,129 @@
+import os
+import math
+import time
+from collections import OrderedDict
+from helpers import fetch_all_products
+
+TRACKINGS_PAGE_SIZE = int(os.getenv("TRACKINGS_PAGE_SIZE", "8"))
+TRACKINGS_CACHE_SIZE = int(os.getenv("TRACKINGS_CACHE_SIZE", "2000"))  # Users kept in memory
+TRACKINGS_CACHE_TTL = int(os.getenv("TRACKINGS_CACHE_TTL", "3600"))  # Seconds; a backstop, changes invalidate entries
+MAX_NAME_LENGTH = 120  # Keeps a full page under Telegram's 4096 character limit
+
+
+class TrackingsView:
+    def __init__(self, rows):
+        self.rows = rows
+        self.pages = {}  # page -> rendered text, filled as pages are viewed
+        self.expires = time.monotonic() + TRACKINGS_CACHE_TTL
+
+    @property
+    def page_count(self):
+        return max(1, math.ceil(len(self.rows) / TRACKINGS_PAGE_SIZE))
+
+
+_views = OrderedDict()  # user_id -> TrackingsView, least recently used first
+_watchers = {}  # product _id -> user_ids with a cached view containing it
+_generations = {}  # user_id -> invalidation count, so a load racing an invalidation isn't cached
+_loads = []  # product _id -> price changes seen by each load still in flight
+
+
+def render_row(number, product):
+    product_name = product.get("product_name") or "Unknown Product"
+    if len(product_name) > MAX_NAME_LENGTH:
+        product_name = product_name[:MAX_NAME_LENGTH - 1] + "…"
+    text = (
+        f"🏷️ **Product {number}**: [{product_name}]({product.get('url')})\n\n"
+        f"💰 **Current Price**: {product.get('price')}\n"
+    )
+    alerts = product.get("alerts")
+    if alerts:
+        rules = []
+        if "target_price" in alerts:
+            rules.append(f"≤ ₹{alerts['target_price']:.2f}")
+        if "drop_percent" in alerts:
+            rules.append(f"drop ≥ {alerts['drop_percent']:g}%")
+        if alerts.get("new_low"):
+            rules.append("new low")
+        text += f"🔔 **Alerts**: {', '.join(rules)}\n"
+    return text + f"❌ Use /stop {product.get('product_id')} to Stop tracking\n\n"
+
+
+def render_page(view, page):
+    start = page * TRACKINGS_PAGE_SIZE
+    rows = view.rows[start:start + TRACKINGS_PAGE_SIZE]
+    header = "Your Tracked Products:\n\n"
+    if view.page_count > 1:
+        header = f"Your Tracked Products (page {page + 1}/{view.page_count}):\n\n"
+    return header + "".join(render_row(start + i, product) for i, product in enumerate(rows, start=1))
+
+
+def _store(user_id, view):
+    _views[user_id] = view
+    _views.move_to_end(user_id)
+    for product in view.rows:
+        _watchers.setdefault(product.get("_id"), set()).add(user_id)
+    while len(_views) > TRACKINGS_CACHE_SIZE:
+        invalidate(next(iter(_views)))
+
+
+async def get_view(user_id):
+    view = _views.get(user_id)
+    if view is not None and view.expires > time.monotonic():
+        _views.move_to_end(user_id)
+        return view
+
+    generation, changes = _generations.get(user_id, 0), {}
+    _loads.append(changes)
+    try:
+        rows = await fetch_all_products(user_id)
+    finally:
+        _loads.remove(changes)
+    # The rows may have been read before a change published during the load
+    for product in rows:
+        if product.get("_id") in changes:
+            product["price"] = changes[product.get("_id")]
+    view = TrackingsView(rows)
+    if _generations.get(user_id, 0) == generation:
+        invalidate(user_id)
+        _store(user_id, view)
+    return view
+
+
+async def get_page(user_id, page=0):
+    # Returns (text, page, page_count); text is None when the user tracks nothing
+    view = await get_view(user_id)
+    if not view.rows:
+        return None, 0, 0
+    page = min(max(page, 0), view.page_count - 1)
+    text = view.pages.get(page)
+    if text is None:
+        text = view.pages[page] = render_page(view, page)
+    return text, page, view.page_count
+
+
+def invalidate(user_id):
+    # Called when the user starts or stops tracking a product or changes its alerts
+    _generations[user_id] = _generations.get(user_id, 0) + 1
+    view = _views.pop(user_id, None)
+    if view is None:
+        return
+    for product in view.rows:
+        users = _watchers.get(product.get("_id"))
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del _watchers[product.get("_id")]
+
+
+def apply_price_change(product_id, price):
+    # Patch the cached rows in place; only the rendered pages need rebuilding
+    for changes in _loads:
+        changes[product_id] = price
+    for user_id in _watchers.get(product_id, ()):
+        view = _views.get(user_id)
+        if view is None:
+            continue
+        for product in view.rows:
+            if product.get("_id") == product_id:
+                product["price"] = price
+        view.pages.clear()
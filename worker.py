@@ -0,0 +1,93 @@
+# Standalone scrape worker: claims jobs from the Jobs collection and runs the
+# price checks the bot process enqueues when SCRAPE_MODE=queue.
+#
+#   python worker.py --concurrency 8
+
+import argparse
+import asyncio
+import os
+import logging
+from db import PRODUCTS, connect, ensure_indexes
+from http_client import close_session
+from job_queue import claim, complete, fail, worker_name
+from background import spawn
+from scheduler import check_product, detect_platform, ScrapeError, NoPriceError
+
+logging.basicConfig(level=logging.INFO)
+
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "2"))
+
+
+async def process(job, stats):
+    product = await PRODUCTS.find_one({"_id": job["product_id"]})
+    if not product:
+        # The product was removed after the job was queued
+        await complete(job)
+        return
+    if detect_platform(product) is None:
+        logging.warning(f"No scraper plugin for product {product['_id']}, skipping")
+        await complete(job)
+        return
+
+    try:
+        change_event = await check_product(product, stats)
+    except NoPriceError as e:
+        # check_product already set the next regular check, which is the retry
+        stats["failed"] += 1
+        logging.warning(str(e))
+        await complete(job)
+        return
+    except ScrapeError as e:
+        stats["failed"] += 1
+        await fail(job, e)
+        return
+    except Exception as e:
+        stats["failed"] += 1
+        logging.error(f"Error checking price for product {product['url']}: {e}")
+        await fail(job, e)
+        return
+
+    await complete(job, {"change": change_event})
+
+
+async def run_worker(concurrency):
+    name = worker_name()
+    stats = {"checked": 0, "updated": 0, "failed": 0, "skipped": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    logging.info(f"Worker {name} started with concurrency {concurrency}")
+
+    async def run_job(job):
+        try:
+            await process(job, stats)
+        finally:
+            semaphore.release()
+
+    while True:
+        await semaphore.acquire()
+        try:
+            job = await claim(name)
+        except Exception as e:
+            logging.error(f"Error claiming job: {e}")
+            job = None
+        if job is None:
+            semaphore.release()
+            await asyncio.sleep(WORKER_POLL_INTERVAL)
+            continue
+        spawn(run_job(job))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", "8")))
+    args = parser.parse_args()
+
+    connect()
+    await ensure_indexes()
+    try:
+        await run_worker(args.concurrency)
+    finally:
+        await close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())